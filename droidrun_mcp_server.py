@@ -1,86 +1,173 @@
-from mcp.server.fastmcp import FastMCP
-import requests
-import base64
+from mcp.server.fastmcp import FastMCP, Image
+import functools
 import json
 import time
 import wifi_config
+import droidrun_trace
+from droidrun_screenshot import SAME_SCREEN_DISTANCE
+from screen_coords import swipe_points
+from ui_summary import MAX_ROWS, render_summary, resolve_id, summarize
+from openclaw_mcp_async import AsyncMCPForMe
 
 # --- CONFIGURATION ---
 # Initialize FastMCP Server
-mcp = FastMCP("DroidRun Control")
+mcp = FastMCP("DroidRun Control", instructions=(
+    "Every tool takes an optional device_id (see list_devices); leave it empty for the default phone."))
 
-# Connection Details from wifi_config.py
-BASE_URL = f"http://{wifi_config.TARGET_IP}:{wifi_config.TARGET_PORT}"
-HEADERS = {
-    "Authorization": f"Bearer {wifi_config.API_KEY}",
-    "Content-Type": "application/json"
-}
+# --- DEVICES ---
+# "default" is the phone in wifi_config.py; more phones come from the file in
+# wifi_config.DEVICES_FILE (same format as wifi_fleet's devices.json). Each
+# phone gets its own async client (pooled connections, snapshot and
+# screenshot caches) on first use, so tool calls on different phones run
+# concurrently without waiting on each other.
+DEFAULT_DEVICE = "default"
+
+class UnknownDevice(ValueError):
+    pass
+
+class DeviceRegistry:
+    def __init__(self):
+        self.specs = {}    # device id -> (ip, port, api_key)
+        self.clients = {}  # device id -> AsyncMCPForMe
+
+    def add(self, device_id, ip, port, api_key):
+        self.specs[device_id] = (ip, int(port), api_key)
+
+    def load_inventory(self, path):
+        from wifi_fleet import load_inventory
+        for d in load_inventory(path): self.add(d["name"], d["ip"], d["port"], d["api_key"])
+
+    def get(self, device_id=""):
+        device_id = device_id or DEFAULT_DEVICE
+        client = self.clients.get(device_id)
+        if client is None:
+            if device_id not in self.specs:
+                raise UnknownDevice(f"unknown device '{device_id}'. Known devices: {', '.join(self.specs)}")
+            client = self.clients[device_id] = AsyncMCPForMe(*self.specs[device_id])
+        return client
+
+    async def close(self):
+        clients, self.clients = self.clients, {}
+        for client in clients.values(): await client.close()
+
+registry = DeviceRegistry()
+if getattr(wifi_config, "TARGET_IP", None):
+    registry.add(DEFAULT_DEVICE, wifi_config.TARGET_IP, wifi_config.TARGET_PORT, wifi_config.API_KEY)
+if getattr(wifi_config, "DEVICES_FILE", None):
+    registry.load_inventory(wifi_config.DEVICES_FILE)
+
+def _tool_error(result):
+    # Tools report failures as an "Error..." string rather than raising
+    return result[:200] if isinstance(result, str) and result.startswith("Error") else None
+
+def _device_errors(fn):
+    # An unknown device_id is reported like every other tool failure, not as a traceback
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await fn(*args, **kwargs)
+        except UnknownDevice as e:
+            return f"Error: {e}"
+    return wrapper
+
+def tool():
+    """mcp.tool() that also traces each call (DROIDRUN_TRACE; a plain mcp.tool() when tracing is off)."""
+    return lambda fn: mcp.tool()(droidrun_trace.traced(_device_errors(fn), failed=_tool_error))
 
 # --- TOOLS ---
 
-@mcp.tool()
-def get_screen_content(mode: str = "fast") -> str:
+@tool()
+async def get_screen_content(mode: str = "summary", max_rows: int = MAX_ROWS, device_id: str = "") -> str:
     """
     Get the current screen content / UI State.
     Args:
-        mode: 'fast' for /a11y_tree (Recommended) or 'full' for /state_full.
+        mode: 'summary' (Recommended) for a compact table of visible, readable or tappable
+              elements with short ids for tap_element; 'fast' for the raw /a11y_tree JSON;
+              'full' for the raw /state_full JSON.
+        max_rows: row limit for 'summary'.
     """
+    device = registry.get(device_id)
+    if mode == "summary":
+        try:
+            tree = await device.transport.get_tree("/a11y_tree")
+            if tree is None: return "Error getting screen: no UI tree"
+            return render_summary(summarize(tree), max_rows=max_rows)
+        except Exception as e:
+            return f"Error getting screen: {e}"
+
     endpoint = "/a11y_tree" if mode == "fast" else "/state_full"
-    url = f"{BASE_URL}{endpoint}"
     
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
+        resp = await device.transport.get(endpoint, timeout=10)
         resp.raise_for_status()
         return json.dumps(resp.json(), ensure_ascii=False)
     except Exception as e:
         return f"Error getting screen: {e}"
 
-@mcp.tool()
-def tap_coordinate(x: int, y: int) -> str:
+@tool()
+async def tap_coordinate(x: int, y: int, device_id: str = "") -> str:
     """
     Tap at specific (x, y) coordinates on the screen.
     """
-    url = f"{BASE_URL}/action/tap"
-    payload = {"x": int(x), "y": int(y)}
-    
+    device = registry.get(device_id)
+    res = await device.tap(x, y)
+    if res["status"] == "error":
+        return f"Error tapping: {res['message']}"
+    return f"Tapped at ({x}, {y})"
+
+@tool()
+async def tap_element(element_id: str, device_id: str = "") -> str:
+    """
+    Tap an element by its id from get_screen_content (summary mode).
+    Ids stay the same across re-reads of the same screen.
+    """
+    device = registry.get(device_id)
     try:
-        requests.post(url, json=payload, headers=HEADERS, timeout=5)
-        return f"Tapped at ({x}, {y})"
+        tree = await device.transport.get_tree("/a11y_tree")
+        i = resolve_id(tree, element_id) if tree else None
+        if i is None:
+            # The cached snapshot may be stale: re-read the screen once
+            tree = await device.transport.get_tree("/a11y_tree", fresh=True)
+            i = resolve_id(tree, element_id) if tree else None
     except Exception as e:
         return f"Error tapping: {e}"
+    if i is None: return f"Error: element '{element_id}' is not on the current screen"
+    cx, cy = tree.center(i)
+    res = await device.tap(cx, cy)
+    if res["status"] == "error":
+        return f"Error tapping: {res['message']}"
+    label = tree.text[i] or tree.desc[i] or element_id
+    return f"Tapped '{label}' at ({cx}, {cy})"
 
-@mcp.tool()
-def type_text(text: str) -> str:
+@tool()
+async def type_text(text: str, device_id: str = "") -> str:
     """
     Type text into the focused input field. 
     Supports Unicode/Thai via Base64.
     """
-    url = f"{BASE_URL}/keyboard/input"
-    b64_text = base64.b64encode(text.encode('utf-8')).decode('utf-8')
-    payload = {"base64_text": b64_text}
-    
-    try:
-        requests.post(url, json=payload, headers=HEADERS, timeout=5)
-        return f"Typed: '{text}'"
-    except Exception as e:
-        return f"Error typing: {e}"
+    device = registry.get(device_id)
+    res = await device.type_text(text)
+    if res["status"] == "error":
+        return f"Error typing: {res['message']}"
+    return f"Typed: '{text}'"
 
-@mcp.tool()
-def press_home() -> str:
+@tool()
+async def press_home(device_id: str = "") -> str:
     """Press the generic Android HOME button."""
-    return _send_global_action(2, "HOME")
+    return await _send_global_action(2, "HOME", device_id)
 
-@mcp.tool()
-def press_back() -> str:
+@tool()
+async def press_back(device_id: str = "") -> str:
     """Press the generic Android BACK button."""
-    return _send_global_action(1, "BACK")
+    return await _send_global_action(1, "BACK", device_id)
 
-@mcp.tool()
-def press_key(key_code_or_name: str) -> str:
+@tool()
+async def press_key(key_code_or_name: str, device_id: str = "") -> str:
     """
     Press a specific key by Code or Name.
     Valid Names: enter, backspace, tab, escape, home, back, up, down, left, right.
     """
+    device = registry.get(device_id)
     KEY_MAP = {
         "enter": 66, "backspace": 67, "tab": 61, "escape": 111,
         "back": 4, "home": 3, 
@@ -90,70 +177,69 @@ def press_key(key_code_or_name: str) -> str:
     code = KEY_MAP.get(k, k)
     
     try:
-        url = f"{BASE_URL}/keyboard/key"
-        requests.post(url, json={"key_code": int(code)}, headers=HEADERS, timeout=5)
-        return f"Pressed Key: {code}"
+        res = await device.press_key(code)
     except Exception as e:
         return f"Error pressing key: {e}"
+    if res["status"] == "error":
+        return f"Error pressing key: {res['message']}"
+    return f"Pressed Key: {code}"
 
-@mcp.tool()
-def long_press(x: int, y: int, duration_ms: int = 1000) -> str:
+@tool()
+async def long_press(x: int, y: int, duration_ms: int = 1000, device_id: str = "") -> str:
     """Long press at coordinates (simulated via Swipe)."""
-    return swipe(x, y, x, y, duration_ms)
+    return await swipe(x, y, x, y, duration_ms, device_id)
 
-@mcp.tool()
-def swipe(sx: int, sy: int, ex: int, ey: int, duration_ms: int = 500) -> str:
+@tool()
+async def swipe(sx: int, sy: int, ex: int, ey: int, duration_ms: int = 500, device_id: str = "") -> str:
     """Swipe from (sx,sy) to (ex,ey)."""
-    url = f"{BASE_URL}/action/swipe"
-    payload = {"startX": int(sx), "startY": int(sy), "endX": int(ex), "endY": int(ey), "duration": int(duration_ms)}
-    try:
-        requests.post(url, json=payload, headers=HEADERS, timeout=5)
-        return f"Swiped {sx},{sy} -> {ex},{ey}"
-    except Exception as e:
-        return f"Error swiping: {e}"
+    device = registry.get(device_id)
+    res = await device.swipe(sx, sy, ex, ey, duration_ms)
+    if res["status"] == "error":
+        return f"Error swiping: {res['message']}"
+    return f"Swiped {sx},{sy} -> {ex},{ey}"
 
-@mcp.tool()
-def swipe_dir(direction: str, duration_ms: int = 500) -> str:
+@tool()
+async def swipe_dir(direction: str, duration_ms: int = 500, device_id: str = "") -> str:
     """Swipe screen by simple direction: left, right, up, down."""
-    # Assume standard 1080x2400 for relative swipes if resolution is unknown
-    cx, cy = 540, 1200
-    dx, dy = 300, 600
-    
+    # Sized from the device's real resolution (read once, then cached)
     direction = direction.lower().strip()
-    if direction == "left":   sx, sy, ex, ey = cx + dx, cy, cx - dx, cy
-    elif direction == "right":  sx, sy, ex, ey = cx - dx, cy, cx + dx, cy
-    elif direction == "up":     sx, sy, ex, ey = cx, cy + dy, cx, cy - dy
-    elif direction == "down":   sx, sy, ex, ey = cx, cy - dy, cx, cy + dy
-    else: return f"Error: Unknown direction '{direction}'"
-    
-    return swipe(sx, sy, ex, ey, duration_ms)
+    points = swipe_points(direction, await registry.get(device_id).screen_size())
+    if points is None: return f"Error: Unknown direction '{direction}'"
+    return await swipe(*points, duration_ms, device_id)
 
-@mcp.tool()
-def clear_text() -> str:
+@tool()
+async def clear_text(device_id: str = "") -> str:
     """Clear text in the focused input field."""
-    url = f"{BASE_URL}/keyboard/clear"
-    try:
-        requests.post(url, json={}, headers=HEADERS, timeout=5)
-        return "Text Cleared"
-    except Exception as e:
-        return f"Error clearing text: {e}"
+    device = registry.get(device_id)
+    res = await device.clear_text()
+    if res["status"] == "error":
+        return f"Error clearing text: {res['message']}"
+    return "Text Cleared"
 
-@mcp.tool()
-def get_device_info() -> str:
-    """Get device status (Current App, Keyboard, etc)."""
-    url = f"{BASE_URL}/phone_state"
+@tool()
+async def get_device_info(device_id: str = "") -> str:
+    """Get device status (Resolution, Current App, Keyboard, etc)."""
+    device = registry.get(device_id)
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=5)
-        return json.dumps(resp.json(), indent=2, ensure_ascii=False)
+        return json.dumps(await device.device_info(), indent=2, ensure_ascii=False)
     except Exception as e:
         return f"Error getting device info: {e}"
 
-@mcp.tool()
-def list_apps() -> str:
+@tool()
+async def list_devices() -> str:
+    """List the phones this server can control (pass the id as device_id to any tool)."""
+    lines = []
+    for device_id, (ip, port, _) in registry.specs.items():
+        lines.append(f"{device_id} ({ip}:{port})" + (" [default]" if device_id == DEFAULT_DEVICE else ""))
+    return "\n".join(lines) or "No devices configured"
+
+@tool()
+async def list_apps(device_id: str = "") -> str:
     """List all installed applications (Label & Package Name)."""
-    url = f"{BASE_URL}/packages"
+    device = registry.get(device_id)
+    endpoint = "/packages"
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
+        resp = await device.transport.get(endpoint, timeout=10)
         apps = resp.json().get("result", [])
         # Simplify output for LLM
         simple_list = [f"{app['label']} ({app['packageName']})" for app in apps]
@@ -161,37 +247,62 @@ def list_apps() -> str:
     except Exception as e:
         return f"Error listing apps: {e}"
 
-@mcp.tool()
-def get_screenshot() -> str:
-    """Get the current screen as a Base64 PNG string."""
-    url = f"{BASE_URL}/screenshot"
+@tool()
+async def get_screenshot(scale: float = 1.0, grayscale: bool = False, crop: str = "", skip_unchanged: bool = True, device_id: str = ""):
+    """
+    Get the current screen as an image.
+    Args:
+        scale: resize factor, e.g. 0.5 for half size (smaller and faster to send).
+        grayscale: send a grayscale image.
+        crop: 'left,top,right,bottom' in screen pixels to send only part of the screen.
+        skip_unchanged: if the screen looks the same as the last screenshot sent, reply with a
+            short note instead of the image. Use false to force a new image.
+    """
+    device = registry.get(device_id)
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        # Verify it's valid base64 or binary
-        if resp.headers.get("Content-Type") == "image/png":
-            return base64.b64encode(resp.content).decode('utf-8')
-        return resp.text # Likely already base64 string from API
+        frame, _ = await device.screenshot_frame()
+        box = tuple(int(v) for v in crop.split(",")) if crop else None
+        variant = (scale, box, grayscale)
+        if skip_unchanged and device.frames.unchanged_since_sent(frame, variant):
+            return "Screen unchanged since the last screenshot (not re-sent)."
+        data = frame.variant(scale=scale, crop=box, grayscale=grayscale)
+        device.frames.mark_sent(frame, variant)
+        return Image(data=data, format="png")
     except Exception as e:
         return f"Error getting screenshot: {e}"
 
-@mcp.tool()
-def stop_app(package_name: str) -> str:
+@tool()
+async def screen_unchanged(threshold: int = SAME_SCREEN_DISTANCE, device_id: str = "") -> str:
+    """
+    Cheap check whether the screen changed since the previous screenshot (no image is sent).
+    Args:
+        threshold: max perceptual-hash distance (0-64) still treated as the same screen.
+    """
+    device = registry.get(device_id)
+    try:
+        frame, prev = await device.screenshot_frame()
+        if prev is None: return "No previous screenshot; captured a baseline."
+        dist = frame.distance(prev)
+        return f"{'unchanged' if dist <= threshold else 'changed'} (distance {dist})"
+    except Exception as e:
+        return f"Error checking screen: {e}"
+
+@tool()
+async def stop_app(package_name: str, device_id: str = "") -> str:
     """Force stop an application by package name."""
-    url = f"{BASE_URL}/action/stop_app"
+    device = registry.get(device_id)
+    endpoint = "/action/stop_app"
     try:
-        resp = requests.post(url, json={"packageName": package_name}, headers=HEADERS, timeout=10)
+        resp = await device.transport.post(endpoint, {"packageName": package_name}, timeout=10)
         return json.dumps(resp.json(), indent=2, ensure_ascii=False)
     except Exception as e:
         return f"Error stopping app: {e}"
 
-def _send_global_action(action_id: int, name: str) -> str:
-    url = f"{BASE_URL}/action/global"
-    payload = {"action": action_id}
-    try:
-        requests.post(url, json=payload, headers=HEADERS, timeout=5)
-        return f"Pressed {name}"
-    except Exception as e:
-        return f"Error pressing {name}: {e}"
+async def _send_global_action(action_id: int, name: str, device_id: str = "") -> str:
+    res = await registry.get(device_id).global_action(action_id)
+    if res["status"] == "error":
+        return f"Error pressing {name}: {res['message']}"
+    return f"Pressed {name}"
 
 if __name__ == "__main__":
     # Run the MCP Server
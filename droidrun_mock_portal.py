@@ -0,0 +1,319 @@
+import argparse
+import base64
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- DEFAULT SCENARIO ---
+# Screen graph used when no --screens file is given: a launcher with a LINE
+# icon, the LINE chat list and a chat room (enough for openclaw_line_send_message.py).
+# Node "goto" = screen to switch to when tapped; screen "on" = transitions for
+# global actions / keys / swipes ("back", "home", "recents", "key:66", "swipe_left", ...).
+DEFAULT_SCREENS = {
+    "start": "home",
+    "screens": {
+        "home": {
+            "app": "com.miui.home", "label": "Launcher",
+            "nodes": [
+                {"text": "LINE", "className": "android.widget.TextView", "resourceId": "com.miui.home:id/icon_title",
+                 "bounds": [780, 1500, 1000, 1720], "goto": "line_chats"},
+                {"text": "Chrome", "className": "android.widget.TextView", "resourceId": "com.miui.home:id/icon_title",
+                 "bounds": [80, 1500, 300, 1720]},
+            ],
+        },
+        "line_chats": {
+            "app": "jp.naver.line.android", "label": "LINE",
+            "nodes": [
+                {"text": "Chats", "className": "android.widget.TextView", "bounds": [40, 120, 400, 220]},
+                {"text": "Family", "className": "android.widget.TextView", "resourceId": "jp.naver.line.android:id/name",
+                 "bounds": [200, 300, 1040, 420], "goto": "line_room"},
+                {"text": "Work", "className": "android.widget.TextView", "resourceId": "jp.naver.line.android:id/name",
+                 "bounds": [200, 440, 1040, 560], "goto": "line_room"},
+            ],
+        },
+        "line_room": {
+            "app": "jp.naver.line.android", "label": "LINE",
+            "nodes": [
+                {"text": "", "className": "android.widget.EditText", "resourceId": "jp.naver.line.android:id/chat_ui_message_edit",
+                 "bounds": [150, 2080, 940, 2200]},
+                {"text": "Send", "contentDescription": "Send", "className": "android.widget.ImageButton",
+                 "resourceId": "jp.naver.line.android:id/chat_ui_send_button_image", "bounds": [960, 2090, 1056, 2190]},
+            ],
+            "on": {"back": "line_chats"},
+        },
+    },
+}
+
+PACKAGES = [
+    {"label": "LINE", "packageName": "jp.naver.line.android"},
+    {"label": "Chrome", "packageName": "com.android.chrome"},
+    {"label": "Settings", "packageName": "com.android.settings"},
+]
+
+GLOBAL_ACTIONS = {1: "back", 2: "home", 3: "recents", 4: "notifications"}
+KEY_EVENTS = {3: "home", 4: "back"}
+
+
+def make_png(width, height, seed=0):
+    """Small valid grayscale PNG (noise rows so it compresses realistically)."""
+    rng = random.Random(seed)
+    row = bytes(rng.getrandbits(8) for _ in range(width))
+    raw = b"".join(b"\x00" + row[y % 7:] + row[:y % 7] for y in range(height))
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+
+class MockDevice:
+    """Screen state machine behind the mock Portal."""
+
+    def __init__(self, screens=None, width=1080, height=2400, filler_nodes=0, screenshot_size=(270, 600)):
+        spec = screens or DEFAULT_SCREENS
+        self.screens = spec["screens"]
+        self.current = spec.get("start") or next(iter(self.screens))
+        self.width = width
+        self.height = height
+        self.filler_nodes = filler_nodes
+        self.typed = ""
+        self.lock = threading.Lock()
+        self.history = []   # (endpoint, payload) of every action received
+        self.png = make_png(*screenshot_size)
+
+    # --- RENDERING ---
+    def _node(self, spec, index):
+        l, t, r, b = spec.get("bounds", [0, 0, 0, 0])
+        text = spec.get("text")
+        if spec.get("className", "").endswith("EditText") and self.typed: text = self.typed
+        node = {
+            "index": index,
+            "className": spec.get("className", "android.view.View"),
+            "text": text,
+            "contentDescription": spec.get("contentDescription"),
+            "resourceId": spec.get("resourceId"),
+            "boundsInScreen": {"left": l, "top": t, "right": r, "bottom": b},
+            "children": [],
+        }
+        for child in spec.get("children", []):
+            node["children"].append(self._node(child, index + 1 + len(node["children"])))
+        return node
+
+    def tree(self):
+        with self.lock:
+            screen = self.screens[self.current]
+            children = [self._node(s, i + 1) for i, s in enumerate(screen.get("nodes", []))]
+            # Filler list rows to reach realistic payload sizes (chat lists, feeds)
+            for i in range(self.filler_nodes):
+                top = 600 + (i * 120) % (self.height - 700)
+                children.append({
+                    "index": len(children) + 1, "className": "android.widget.TextView",
+                    "text": f"Item {i}", "contentDescription": None,
+                    "resourceId": f"{screen.get('app', 'mock')}:id/row_title",
+                    "boundsInScreen": {"left": 40, "top": top, "right": self.width - 40, "bottom": top + 100},
+                    "children": [],
+                })
+            return [{
+                "index": 0, "className": "android.widget.FrameLayout", "text": None,
+                "contentDescription": None, "resourceId": None,
+                "boundsInScreen": {"left": 0, "top": 0, "right": self.width, "bottom": self.height},
+                "children": children,
+            }]
+
+    def phone_state(self):
+        with self.lock:
+            screen = self.screens[self.current]
+            return {
+                "currentApp": screen.get("label", screen.get("app")),
+                "packageName": screen.get("app"),
+                "displayWidth": self.width,
+                "displayHeight": self.height,
+                "keyboardVisible": self.current_has_input(),
+                "focusedElement": None,
+            }
+
+    def current_has_input(self):
+        return any(n.get("className", "").endswith("EditText") for n in self.screens[self.current].get("nodes", []))
+
+    # --- TRANSITIONS ---
+    def _go(self, target):
+        if target and target in self.screens and target != self.current:
+            self.current = target
+            self.typed = ""
+
+    def event(self, name):
+        with self.lock:
+            target = self.screens[self.current].get("on", {}).get(name)
+            if target is None and name == "home" and "home" in self.screens: target = "home"
+            self._go(target)
+
+    def tap(self, x, y):
+        with self.lock:
+            hit = None
+            stack = list(self.screens[self.current].get("nodes", []))
+            while stack:
+                spec = stack.pop()
+                l, t, r, b = spec.get("bounds", [0, 0, 0, 0])
+                if l <= x <= r and t <= y <= b and spec.get("goto"): hit = spec
+                stack.extend(spec.get("children", []))
+            if hit: self._go(hit["goto"])
+
+    def swipe(self, sx, sy, ex, ey):
+        dx, dy = ex - sx, ey - sy
+        if dx == 0 and dy == 0: return self.event("long_press")
+        if abs(dx) >= abs(dy): self.event("swipe_left" if dx < 0 else "swipe_right")
+        else: self.event("swipe_up" if dy < 0 else "swipe_down")
+
+    def launch(self, package):
+        with self.lock:
+            for name, screen in self.screens.items():
+                if screen.get("app") == package and not screen.get("on", {}).get("back"):
+                    self._go(name)
+                    return True
+        return False
+
+    def handle_action(self, endpoint, payload):
+        self.history.append((endpoint, payload))
+        if endpoint == "/action/tap": self.tap(int(payload.get("x", 0)), int(payload.get("y", 0)))
+        elif endpoint == "/action/swipe":
+            self.swipe(payload.get("startX", 0), payload.get("startY", 0), payload.get("endX", 0), payload.get("endY", 0))
+        elif endpoint == "/action/global": self.event(GLOBAL_ACTIONS.get(payload.get("action"), "unknown"))
+        elif endpoint == "/action/launch": return self.launch(payload.get("package"))
+        elif endpoint == "/action/shell":
+            cmd = payload.get("command", "").split()
+            if "-p" in cmd: return self.launch(cmd[cmd.index("-p") + 1])
+        elif endpoint == "/action/stop_app": self.event("home")
+        elif endpoint == "/keyboard/input":
+            text = base64.b64decode(payload.get("base64_text", "")).decode("utf-8", "replace")
+            with self.lock: self.typed += text
+        elif endpoint == "/keyboard/clear":
+            with self.lock: self.typed = ""
+        elif endpoint == "/keyboard/key":
+            code = int(payload.get("key_code", 0))
+            if code == 67:
+                with self.lock: self.typed = self.typed[:-1]
+            else: self.event(KEY_EVENTS.get(code, f"key:{code}"))
+        return True
+
+
+class MockPortalHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # keep-alive, like the real Portal
+    disable_nagle_algorithm = True # headers and body are separate writes; avoid 40 ms delayed-ACK stalls
+
+    def log_message(self, *args):
+        if self.server.verbose: super().log_message(*args)
+
+    def _delay(self):
+        latency, jitter = self.server.latency, self.server.jitter
+        if latency or jitter: time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+    def _send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes): body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        key = self.server.api_key
+        if key and self.headers.get("Authorization") != f"Bearer {key}":
+            self._send(401, {"status": "error", "error": "Unauthorized"})
+            return False
+        return True
+
+    def _count(self, path):
+        with self.server.stats_lock:
+            self.server.stats[path] = self.server.stats.get(path, 0) + 1
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/_stats": return self._send(200, self.server.stats)
+        if not self._authorized(): return
+        self._count(path)
+        self._delay()
+        device = self.server.device
+
+        if path == "/ping": self._send(200, {"status": "success", "result": "pong"})
+        elif path == "/phone_state":
+            self._send(200, {"status": "success", "result": json.dumps(device.phone_state(), ensure_ascii=False)})
+        elif path == "/a11y_tree":
+            self._send(200, {"status": "success", "result": json.dumps(device.tree(), ensure_ascii=False)})
+        elif path == "/state_full":
+            state = {"a11y_tree": device.tree(), "phone_state": device.phone_state()}
+            self._send(200, {"status": "success", "result": json.dumps(state, ensure_ascii=False)})
+        elif path == "/screenshot": self._send(200, device.png, "image/png")
+        elif path == "/packages": self._send(200, {"status": "success", "result": PACKAGES})
+        else: self._send(404, {"status": "error", "error": f"Unknown endpoint {path}"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if not self._authorized(): return
+        path = self.path.split("?")[0]
+        self._count(path)
+        self._delay()
+        if not (path.startswith("/action/") or path.startswith("/keyboard/")):
+            return self._send(404, {"status": "error", "error": f"Unknown endpoint {path}"})
+        try:
+            payload = json.loads(body) if body else {}
+            ok = self.server.device.handle_action(path, payload)
+        except Exception as e:
+            return self._send(400, {"status": "error", "error": str(e)})
+        if ok is False: return self._send(400, {"status": "error", "error": "Package not found"})
+        self._send(200, {"status": "success", "result": "ok"})
+
+
+def start_server(host="127.0.0.1", port=0, api_key=None, latency_ms=0, jitter_ms=0,
+                 screens=None, filler_nodes=0, width=1080, height=2400, screenshot_size=(270, 600), verbose=False):
+    """Start a mock Portal in a background thread; returns the server (server.server_address, .device)."""
+    server = ThreadingHTTPServer((host, port), MockPortalHandler)
+    server.daemon_threads = True
+    server.api_key = api_key
+    server.latency = latency_ms / 1000.0
+    server.jitter = jitter_ms / 1000.0
+    server.verbose = verbose
+    server.stats = {}
+    server.stats_lock = threading.Lock()
+    server.device = MockDevice(screens, width, height, filler_nodes, screenshot_size)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock DroidRun Portal for offline testing/benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--api-key", default=None, help="require this Bearer token (default: accept anything)")
+    parser.add_argument("--latency", type=float, default=0, help="base latency per request (ms)")
+    parser.add_argument("--jitter", type=float, default=0, help="+/- random jitter (ms)")
+    parser.add_argument("--nodes", type=int, default=0, help="extra filler nodes per screen (payload size)")
+    parser.add_argument("--screens", help="JSON screen graph (see DEFAULT_SCREENS)")
+    parser.add_argument("--size", default="1080x2400", help="display resolution WxH")
+    parser.add_argument("--screenshot", default="270x600", help="screenshot PNG size WxH")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    screens = None
+    if args.screens:
+        with open(args.screens, "r", encoding="utf-8") as f: screens = json.load(f)
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    shot = tuple(int(v) for v in args.screenshot.lower().split("x"))
+
+    server = start_server(args.host, args.port, args.api_key, args.latency, args.jitter,
+                          screens, args.nodes, width, height, shot, args.verbose)
+    host, port = server.server_address
+    print(f"🧪 Mock DroidRun Portal on http://{host}:{port} (latency {args.latency}±{args.jitter} ms, +{args.nodes} nodes)")
+    print(f"   wifi_config.py -> TARGET_IP = \"{host}\", TARGET_PORT = {port}, API_KEY = \"{args.api_key or 'anything'}\"")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("\n👋 Mock Portal stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import base64
+import binascii
+import functools
+import io
+import json
+import threading
+import time
+
+# --- SCREENSHOTS ---
+# Frames keep the PNG exactly as the Portal sent it (one immutable bytes
+# object, never re-encoded unless a variant is asked for). Decoding, resizing
+# and hashing need Pillow (`pip install pillow`); without it frames still
+# compare by exact content.
+
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+HASH_SIZE = 8               # dHash grid: 8x8 -> 64-bit hash
+SAME_SCREEN_DISTANCE = 4    # max differing hash bits for "same screen"
+
+@functools.lru_cache(maxsize=None)
+def has_pillow():
+    try:
+        import PIL.Image # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _pil():
+    if not has_pillow():
+        raise ImportError("screenshot variants / perceptual hash require Pillow: pip install pillow")
+    from PIL import Image
+    return Image
+
+def decode_screenshot(content, content_type=None):
+    """/screenshot body -> raw image bytes (accepts PNG, base64 text, or the JSON wrapper)."""
+    if content[:8] == PNG_MAGIC or (content_type or "").startswith("image/"): return bytes(content)
+    text = content.strip()
+    if text[:1] in (b"{", "{"):
+        data = json.loads(text)
+        text = data.get("result") or data.get("data") or ""
+    if isinstance(text, str): text = text.encode()
+    if text.startswith(b"data:"): text = text.split(b",", 1)[-1]
+    try:
+        return base64.b64decode(text, validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"unrecognised screenshot payload: {e}")
+
+
+class Frame:
+    """One screenshot: raw bytes plus lazily computed hash and variants."""
+
+    __slots__ = ("data", "taken_at", "_phash", "_image", "_variants")
+
+    def __init__(self, data, taken_at=None):
+        self.data = data
+        self.taken_at = taken_at or time.time()
+        self._phash = None
+        self._image = None
+        self._variants = {}
+
+    @classmethod
+    def from_response(cls, content, content_type=None):
+        return cls(decode_screenshot(content, content_type))
+
+    def __len__(self):
+        return len(self.data)
+
+    def view(self):
+        """Zero-copy view of the encoded image."""
+        return memoryview(self.data)
+
+    def image(self):
+        if self._image is None:
+            self._image = _pil().open(io.BytesIO(self.data))
+            self._image.load()
+        return self._image
+
+    @property
+    def size(self):
+        return self.image().size
+
+    def variant(self, scale=1.0, crop=None, grayscale=False, fmt="PNG"):
+        """Encoded bytes of a resized/cropped/grayscale copy; the original bytes when nothing changes.
+
+        crop is (left, top, right, bottom) in original pixels, applied before scaling.
+        """
+        crop = tuple(crop) if crop else None
+        if scale == 1.0 and not crop and not grayscale and fmt == "PNG": return self.data
+        key = (scale, crop, grayscale, fmt)
+        out = self._variants.get(key)
+        if out is None:
+            img = self.image()
+            if crop: img = img.crop(crop)
+            if grayscale: img = img.convert("L")
+            if scale != 1.0:
+                w, h = img.size
+                img = img.resize((max(1, int(w * scale)), max(1, int(h * scale))), _pil().BILINEAR)
+            if fmt == "JPEG" and img.mode not in ("RGB", "L"): img = img.convert("RGB")
+            buf = io.BytesIO()
+            img.save(buf, fmt, optimize=True)
+            out = self._variants[key] = buf.getvalue()
+        return out
+
+    @property
+    def phash(self):
+        """64-bit difference hash (dHash), or None without Pillow."""
+        if self._phash is None:
+            if not has_pillow(): return None
+            img = self.image().convert("L").resize((HASH_SIZE + 1, HASH_SIZE), _pil().BILINEAR)
+            px = list(img.getdata())
+            bits = 0
+            for row in range(HASH_SIZE):
+                base = row * (HASH_SIZE + 1)
+                for col in range(HASH_SIZE):
+                    bits = (bits << 1) | (px[base + col] > px[base + col + 1])
+            self._phash = bits
+        return self._phash
+
+    def distance(self, other):
+        """Differing hash bits (0-64); exact-content comparison when no hash is available."""
+        if self.data == other.data: return 0
+        a, b = self.phash, other.phash
+        if a is None or b is None: return HASH_SIZE * HASH_SIZE
+        return bin(a ^ b).count("1")
+
+    def same_as(self, other, threshold=SAME_SCREEN_DISTANCE):
+        return other is not None and self.distance(other) <= threshold
+
+
+class FrameCache:
+    """Last frame per device, plus the last one actually handed to a caller (e.g. the LLM).
+
+    The sent frame is kept with the variant it went out as (scale, crop,
+    grayscale...), so asking for a different view of the same screen is not
+    treated as "already sent".
+    """
+
+    def __init__(self):
+        self.last = None
+        self.sent = None
+        self.sent_variant = None
+        self._lock = threading.Lock()
+
+    def put(self, frame):
+        """Store a new frame; returns the previous one."""
+        with self._lock:
+            prev, self.last = self.last, frame
+        return prev
+
+    def mark_sent(self, frame, variant=()):
+        self.sent, self.sent_variant = frame, variant
+
+    def unchanged_since_sent(self, frame, variant=(), threshold=SAME_SCREEN_DISTANCE):
+        if variant != self.sent_variant: return False
+        return frame.same_as(self.sent, threshold)
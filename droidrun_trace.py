@@ -0,0 +1,214 @@
+import atexit
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+
+# --- TRACING ---
+# Off unless DROIDRUN_TRACE names a JSONL file (or enable() is called). Hooks
+# only test `active`, which is None when tracing is off, so a disabled trace
+# costs one global lookup per request/step.
+#
+# One JSON object per line:
+#   {"kind": "request", "name": "GET /a11y_tree", "ms": 41.2, "status": 200, "bytes": 53120, "retries": 0, ...}
+#   {"kind": "step", "name": "tap", "step": 3, "ms": 1562.0, "ok": true, ...}
+#   {"kind": "tool", "name": "tap_element", "ms": 88.4, ...}
+# plus "ts" (unix time), "device" (base url) and "error" when something failed.
+
+ENV_VAR = "DROIDRUN_TRACE"
+PERCENTILES = (0.50, 0.95, 0.99)
+
+active = None
+
+# Kind of the traced call currently running, so nested calls of the same kind
+# (a tool implemented by awaiting another tool) are not recorded twice
+_inside = contextvars.ContextVar("droidrun_trace_inside", default=None)
+
+class Tracer:
+    """Writes trace events to a JSONL file and keeps latencies for summaries."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.latencies = {}  # (kind, name) -> [ms]
+        self.errors = {}     # (kind, name) -> count
+        self.bytes = {}      # (kind, name) -> total response bytes
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8", buffering=1) if path else None
+
+    def emit(self, event):
+        event["ts"] = round(time.time(), 3)
+        key = (event["kind"], event["name"])
+        line = json.dumps(event, ensure_ascii=False) if self._file else None
+        with self._lock:
+            self.latencies.setdefault(key, []).append(event["ms"])
+            if event.get("error"): self.errors[key] = self.errors.get(key, 0) + 1
+            if event.get("bytes"): self.bytes[key] = self.bytes.get(key, 0) + event["bytes"]
+            if line: self._file.write(line + "\n")
+
+    def request(self, method, endpoint, t0, resp=None, retries=0, error=None, device=None):
+        event = {"kind": "request", "name": f"{method} {endpoint.split('?')[0]}",
+                 "ms": round((time.perf_counter() - t0) * 1000, 3), "retries": retries}
+        if resp is not None:
+            event["status"] = resp.status_code
+            event["bytes"] = len(resp.content)
+        if error is not None: event["error"] = f"{type(error).__name__}: {error}"
+        elif resp is not None and resp.status_code >= 400: event["error"] = f"HTTP {resp.status_code}"
+        if device: event["device"] = device
+        self.emit(event)
+
+    def summary(self):
+        return summarize(self.latencies, self.errors, self.bytes)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+def enable(path=None):
+    """Start tracing to `path` (None = in-memory summaries only); returns the tracer."""
+    global active
+    if active is None:
+        active = Tracer(path)
+        atexit.register(active.close)
+    return active
+
+def disable():
+    global active
+    tracer, active = active, None
+    if tracer: tracer.close()
+    return tracer
+
+if os.environ.get(ENV_VAR): enable(os.environ[ENV_VAR])
+
+
+# --- HOOKS ---
+class StepTimer:
+    """Per-step timing for straight-line scripts: mark() closes the previous step."""
+
+    def __init__(self, device=None):
+        self.device = device
+        self.current = None  # (step, name, t0)
+
+    def mark(self, step, name):
+        if active is None: return
+        now = time.perf_counter()
+        self._close(now)
+        self.current = (step, name, now)
+
+    def end(self):
+        if active is None: return
+        self._close(time.perf_counter())
+        self.current = None
+
+    def _close(self, now):
+        if self.current is None: return
+        step, name, t0 = self.current
+        event = {"kind": "step", "name": name, "step": step, "ms": round((now - t0) * 1000, 3), "ok": True}
+        if self.device: event["device"] = self.device
+        active.emit(event)
+
+def traced(fn, kind="tool", failed=None):
+    """Wrap a sync or async function so each call becomes a trace event.
+
+    Only the outermost call of `kind` is recorded. `failed(result)` may
+    return an error message for results that report a failure instead of
+    raising. Returns fn itself when tracing is off at decoration time.
+    """
+    if active is None: return fn
+    import functools
+    import inspect
+
+    def finish(t0, error, result=None):
+        event = {"kind": kind, "name": fn.__name__, "ms": round((time.perf_counter() - t0) * 1000, 3)}
+        if error is not None: event["error"] = f"{type(error).__name__}: {error}"
+        elif failed is not None:
+            message = failed(result)
+            if message: event["error"] = message
+        if active: active.emit(event)
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if _inside.get() == kind: return await fn(*args, **kwargs)
+            token = _inside.set(kind)
+            t0 = time.perf_counter()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                finish(t0, e)
+                raise
+            finally:
+                _inside.reset(token)
+            finish(t0, None, result)
+            return result
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _inside.get() == kind: return fn(*args, **kwargs)
+            token = _inside.set(kind)
+            t0 = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                finish(t0, e)
+                raise
+            finally:
+                _inside.reset(token)
+            finish(t0, None, result)
+            return result
+    return wrapper
+
+
+# --- SUMMARIES ---
+def percentile(sorted_ms, q):
+    return sorted_ms[min(len(sorted_ms) - 1, int(round(q * (len(sorted_ms) - 1))))]
+
+def summarize(latencies, errors=None, sizes=None):
+    """Rows {kind, name, n, p50_ms, p95_ms, p99_ms, max_ms, errors, bytes} sorted by kind, name."""
+    rows = []
+    for key in sorted(latencies):
+        s = sorted(latencies[key])
+        row = {"kind": key[0], "name": key[1], "n": len(s)}
+        for q in PERCENTILES: row[f"p{int(q * 100)}_ms"] = round(percentile(s, q), 3)
+        row["max_ms"] = round(s[-1], 3)
+        row["errors"] = (errors or {}).get(key, 0)
+        row["bytes"] = (sizes or {}).get(key, 0)
+        rows.append(row)
+    return rows
+
+def load_trace(path):
+    """(latencies, errors, bytes) aggregated from a JSONL trace file."""
+    latencies, errors, sizes = {}, {}, {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip(): continue
+            event = json.loads(line)
+            key = (event["kind"], event["name"])
+            latencies.setdefault(key, []).append(event["ms"])
+            if event.get("error"): errors[key] = errors.get(key, 0) + 1
+            if event.get("bytes"): sizes[key] = sizes.get(key, 0) + event["bytes"]
+    return latencies, errors, sizes
+
+def print_summary(rows, out=sys.stdout):
+    print(f"{'KIND':<8} | {'NAME':<28} | {'N':>6} | {'P50':>9} | {'P95':>9} | {'P99':>9} | {'MAX':>9} | {'ERR':>4} | BYTES", file=out)
+    print("-" * 112, file=out)
+    for r in rows:
+        print(f"{r['kind']:<8} | {r['name'][:28]:<28} | {r['n']:>6} | {r['p50_ms']:>7.1f}ms | {r['p95_ms']:>7.1f}ms | "
+              f"{r['p99_ms']:>7.1f}ms | {r['max_ms']:>7.1f}ms | {r['errors']:>4} | {r['bytes']}", file=out)
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Latency percentiles per endpoint / step from a DroidRun trace")
+    parser.add_argument("trace", help="JSONL file written with DROIDRUN_TRACE=<file>")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+    rows = summarize(*load_trace(args.trace))
+    if args.json: print(json.dumps(rows, indent=2))
+    else: print_summary(rows)
+
+if __name__ == "__main__":
+    main()
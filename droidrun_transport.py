@@ -0,0 +1,415 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import droidrun_trace
+from ui_tree import UITree, decode_payload, scan_payload
+
+# --- TIMEOUTS (วินาที) ---
+# Per-endpoint defaults, used when the caller does not pass its own timeout
+ENDPOINT_TIMEOUTS = {
+    "/ping": 2,
+    "/phone_state": 3,
+    "/a11y_tree": 5,
+    "/state_full": 10,
+    "/screenshot": 10,
+    "/packages": 10,
+    "/action/launch": 10,
+    "/action/shell": 10,
+    "/action/stop_app": 10,
+}
+DEFAULT_TIMEOUT = 5
+
+# Idempotent reads that are safe to retry on connection errors / 5xx
+RETRY_ENDPOINTS = {"/ping", "/phone_state", "/a11y_tree", "/state_full", "/screenshot", "/packages"}
+
+# POSTs under these prefixes change the screen (tap, swipe, global, keyboard input...)
+MUTATING_PREFIXES = ("/action/", "/keyboard/")
+
+
+class SnapshotCache:
+    """Last UI snapshot per endpoint for one device.
+
+    Cleared whenever a mutating action is sent through the transport; entries
+    older than `max_age` seconds (None = no limit) are treated as missing.
+    """
+
+    def __init__(self, max_age=None):
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # endpoint -> [timestamp, root, UITree or None]
+        self._lock = threading.Lock()
+
+    def get(self, endpoint, max_age=None):
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(endpoint)
+            if entry and (max_age is None or time.monotonic() - entry[0] <= max_age):
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def put(self, endpoint, root):
+        entry = [time.monotonic(), root, None]
+        with self._lock:
+            self._entries[endpoint] = entry
+        return entry
+
+    def invalidate(self, endpoint=None):
+        with self._lock:
+            if endpoint is None: self._entries.clear()
+            else: self._entries.pop(endpoint, None)
+
+
+def _entry_tree(entry, endpoint):
+    """UITree for a snapshot cache entry, built once and kept in the entry."""
+    if entry[2] is None:
+        root = entry[1]
+        if endpoint == "/state_full" and isinstance(root, dict): root = root.get("a11y_tree")
+        entry[2] = UITree(root)
+    return entry[2]
+
+
+# --- DEVICE INFO CACHE ---
+# Display size almost never changes, so it is kept on disk (per Portal address
+# + API key) and short-lived CLI runs skip the /phone_state round trip.
+DEVICE_INFO_TTL = 24 * 3600  # seconds, 0 = don't use the disk cache
+
+def cache_dir():
+    return os.environ.get("DROIDRUN_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "droidrun")
+
+def device_info_path():
+    return os.path.join(cache_dir(), "device_info.json")
+
+def device_key(base_url, api_key):
+    return f"{base_url}#{hashlib.sha1(api_key.encode()).hexdigest()[:8]}"
+
+def load_device_info(key):
+    if not DEVICE_INFO_TTL: return None
+    try:
+        with open(device_info_path(), "r", encoding="utf-8") as f:
+            entry = json.load(f).get(key)
+    except (OSError, ValueError, AttributeError):
+        return None
+    if not entry or time.time() - entry.get("ts", 0) > DEVICE_INFO_TTL: return None
+    return entry
+
+def save_device_info(key, **info):
+    if not DEVICE_INFO_TTL: return
+    path = device_info_path()
+    try:
+        try:
+            with open(path, "r", encoding="utf-8") as f: data = json.load(f)
+        except (OSError, ValueError): data = {}
+        if not isinstance(data, dict): data = {}
+        data[key] = dict(info, ts=round(time.time()))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(data, f)
+        os.replace(tmp, path)
+    except OSError: pass
+
+def _parse_display_size(content):
+    data = decode_payload(content)
+    if isinstance(data, dict) and data.get("displayWidth"):
+        return (int(data["displayWidth"]), int(data["displayHeight"]))
+    return ()
+
+
+class DroidRunTransport:
+    """Keep-alive HTTP connection pool to one DroidRun Portal."""
+
+    def __init__(self, ip, port, api_key, pool_size=4, retries=2, backoff=0.15):
+        # Imported here, not at module load: the async side and CLI usage/help don't need it
+        import requests
+        from requests.adapters import HTTPAdapter
+        self._requests = requests
+        self.base_url = f"http://{ip}:{port}"
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+        self.retries = retries
+        self.backoff = backoff
+        self.snapshots = SnapshotCache()
+        self._display_size = None
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+
+    def timeout_for(self, endpoint):
+        return ENDPOINT_TIMEOUTS.get(endpoint.split("?")[0], DEFAULT_TIMEOUT)
+
+    def get(self, endpoint, timeout=None):
+        url = f"{self.base_url}{endpoint}"
+        timeout = timeout or self.timeout_for(endpoint)
+        attempts = 1 + (self.retries if endpoint.split("?")[0] in RETRY_ENDPOINTS else 0)
+        tracer = droidrun_trace.active
+        t0 = time.perf_counter() if tracer else 0
+
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                resp = self.session.get(url, timeout=timeout)
+            except (self._requests.ConnectionError, self._requests.Timeout) as e:
+                if last:
+                    if tracer: tracer.request("GET", endpoint, t0, None, attempt, e, self.base_url)
+                    raise
+            else:
+                if resp.status_code < 500 or last:
+                    if tracer: tracer.request("GET", endpoint, t0, resp, attempt, None, self.base_url)
+                    return resp
+            time.sleep(self.backoff * (2 ** attempt))
+
+    def post(self, endpoint, payload=None, timeout=None):
+        url = f"{self.base_url}{endpoint}"
+        timeout = timeout or self.timeout_for(endpoint)
+        tracer = droidrun_trace.active
+        t0 = time.perf_counter() if tracer else 0
+        resp = error = None
+        try:
+            resp = self.session.post(url, json=payload if payload is not None else {}, timeout=timeout)
+            return resp
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if endpoint.startswith(MUTATING_PREFIXES): self.snapshots.invalidate()
+            if tracer: tracer.request("POST", endpoint, t0, resp, 0, error, self.base_url)
+
+    # --- CACHED SNAPSHOTS ---
+    def _snapshot_entry(self, endpoint, max_age=None, fresh=False):
+        entry = None if fresh else self.snapshots.get(endpoint, max_age)
+        if entry is None:
+            resp = self.get(endpoint)
+            if resp.status_code != 200: return None
+            root = decode_payload(resp.content)
+            if root is None: return None
+            entry = self.snapshots.put(endpoint, root)
+        return entry
+
+    def get_snapshot(self, endpoint="/a11y_tree", max_age=None, fresh=False):
+        """Unwrapped payload of a read endpoint, served from the snapshot cache when valid."""
+        entry = self._snapshot_entry(endpoint, max_age, fresh)
+        return entry[1] if entry else None
+
+    def get_tree(self, endpoint="/a11y_tree", max_age=None, fresh=False):
+        """UITree of the current screen; the index is built once per cached snapshot."""
+        entry = self._snapshot_entry(endpoint, max_age, fresh)
+        return _entry_tree(entry, endpoint) if entry else None
+
+    def find_node(self, criteria, endpoint="/a11y_tree", id_match="exact", max_age=None, fresh=False):
+        """Best node for criteria on the current screen.
+
+        With a valid cached snapshot this is an index lookup. Otherwise the
+        response is decoded with an early stop on an exact match; only a
+        fully decoded snapshot goes into the cache.
+        """
+        entry = None if fresh else self.snapshots.get(endpoint, max_age)
+        if entry is None:
+            resp = self.get(endpoint)
+            if resp.status_code != 200: return None
+            node, root = scan_payload(resp.content, criteria, id_match)
+            if node is not None or root is None: return node
+            entry = self.snapshots.put(endpoint, root)
+        return _entry_tree(entry, endpoint).find_node(criteria, id_match)
+
+    def find_many(self, selectors, endpoint="/a11y_tree", id_match="exact", limit=None, max_age=None, fresh=False):
+        """UITree.find_many() on one snapshot of the current screen: {name: [Match, ...]} ranked."""
+        tree = self.get_tree(endpoint, max_age, fresh)
+        if tree is None: return {name: [] for name in selectors}
+        return tree.find_many(selectors, id_match, limit)
+
+    def display_size(self):
+        """(width, height) of the screen, read once per device (and kept on disk for a day); None if unknown."""
+        if self._display_size is None:
+            key = device_key(self.base_url, self.headers["Authorization"])
+            entry = load_device_info(key)
+            size = tuple(entry["size"]) if entry else ()
+            if not size:
+                try:
+                    resp = self.get("/phone_state")
+                    if resp.status_code == 200: size = _parse_display_size(resp.content)
+                except (self._requests.RequestException, ValueError): pass
+                if size: save_device_info(key, size=list(size))
+            self._display_size = size
+        return self._display_size or None
+
+    def close(self):
+        self.session.close()
+
+
+# --- SHARED POOL REGISTRY ---
+# One transport per device, shared by every client in the process
+_transports = {}
+_lock = threading.Lock()
+
+def get_transport(ip=None, port=None, api_key=None):
+    if ip is None or port is None or api_key is None:
+        import wifi_config
+        ip = wifi_config.TARGET_IP if ip is None else ip
+        port = wifi_config.TARGET_PORT if port is None else port
+        api_key = wifi_config.API_KEY if api_key is None else api_key
+
+    key = (ip, int(port), api_key)
+    with _lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = DroidRunTransport(ip, port, api_key)
+            _transports[key] = transport
+        return transport
+
+
+class AsyncDroidRunTransport:
+    """asyncio counterpart of DroidRunTransport (requires `pip install httpx`)."""
+
+    def __init__(self, ip, port, api_key, pool_size=8, retries=2, backoff=0.15):
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("AsyncDroidRunTransport requires httpx: pip install httpx")
+        import asyncio
+        self._httpx = httpx
+        self._sleep = asyncio.sleep
+        self.base_url = f"http://{ip}:{port}"
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+        }
+        self.retries = retries
+        self.backoff = backoff
+        self.snapshots = SnapshotCache()
+        self._display_size = None
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.client = httpx.AsyncClient(base_url=self.base_url, headers=self.headers, limits=limits)
+
+    def timeout_for(self, endpoint):
+        return ENDPOINT_TIMEOUTS.get(endpoint.split("?")[0], DEFAULT_TIMEOUT)
+
+    async def get(self, endpoint, timeout=None):
+        timeout = timeout or self.timeout_for(endpoint)
+        attempts = 1 + (self.retries if endpoint.split("?")[0] in RETRY_ENDPOINTS else 0)
+        tracer = droidrun_trace.active
+        t0 = time.perf_counter() if tracer else 0
+
+        for attempt in range(attempts):
+            last = attempt == attempts - 1
+            try:
+                resp = await self.client.get(endpoint, timeout=timeout)
+            except self._httpx.TransportError as e:
+                if last:
+                    if tracer: tracer.request("GET", endpoint, t0, None, attempt, e, self.base_url)
+                    raise
+            else:
+                if resp.status_code < 500 or last:
+                    if tracer: tracer.request("GET", endpoint, t0, resp, attempt, None, self.base_url)
+                    return resp
+            await self._sleep(self.backoff * (2 ** attempt))
+
+    async def post(self, endpoint, payload=None, timeout=None):
+        timeout = timeout or self.timeout_for(endpoint)
+        tracer = droidrun_trace.active
+        t0 = time.perf_counter() if tracer else 0
+        resp = error = None
+        try:
+            resp = await self.client.post(endpoint, json=payload if payload is not None else {}, timeout=timeout)
+            return resp
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if endpoint.startswith(MUTATING_PREFIXES): self.snapshots.invalidate()
+            if tracer: tracer.request("POST", endpoint, t0, resp, 0, error, self.base_url)
+
+    async def _snapshot_entry(self, endpoint, max_age=None, fresh=False):
+        entry = None if fresh else self.snapshots.get(endpoint, max_age)
+        if entry is None:
+            resp = await self.get(endpoint)
+            if resp.status_code != 200: return None
+            root = decode_payload(resp.content)
+            if root is None: return None
+            entry = self.snapshots.put(endpoint, root)
+        return entry
+
+    async def get_snapshot(self, endpoint="/a11y_tree", max_age=None, fresh=False):
+        entry = await self._snapshot_entry(endpoint, max_age, fresh)
+        return entry[1] if entry else None
+
+    async def get_tree(self, endpoint="/a11y_tree", max_age=None, fresh=False):
+        entry = await self._snapshot_entry(endpoint, max_age, fresh)
+        return _entry_tree(entry, endpoint) if entry else None
+
+    async def display_size(self):
+        if self._display_size is None:
+            key = device_key(self.base_url, self.headers["Authorization"])
+            entry = load_device_info(key)
+            size = tuple(entry["size"]) if entry else ()
+            if not size:
+                try:
+                    resp = await self.get("/phone_state")
+                    if resp.status_code == 200: size = _parse_display_size(resp.content)
+                except (self._httpx.HTTPError, ValueError): pass
+                if size: save_device_info(key, size=list(size))
+            self._display_size = size
+        return self._display_size or None
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class ActionQueue:
+    """Collects actions and sends them in order over the transport's keep-alive pool.
+
+    flush() returns one result per action ({"status": "success", "data": ...} or
+    {"status": "error", "message": ...}, plus endpoint and elapsed seconds).
+    An action added with a `fallback` (endpoint, payload) sends that instead
+    when it fails, and reports the fallback's result.
+    """
+
+    def __init__(self, transport, stop_on_error=False):
+        self.transport = transport
+        self.stop_on_error = stop_on_error
+        self.actions = []   # [endpoint, payload, delay_after, fallback]
+        self.results = []
+
+    def __len__(self):
+        return len(self.actions)
+
+    def add(self, endpoint, payload=None, delay=0, fallback=None):
+        self.actions.append([endpoint, payload or {}, delay, fallback])
+
+    def sleep(self, seconds):
+        # Pause after the previous action; a leading sleep becomes a no-op entry
+        if self.actions: self.actions[-1][2] += seconds
+        else: self.actions.append([None, None, seconds, None])
+
+    def _send(self, endpoint, payload):
+        try:
+            resp = self.transport.post(endpoint, payload)
+            resp.raise_for_status()
+            return {"status": "success", "data": resp.json() if resp.text else None}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    def flush(self):
+        results = []
+        actions, self.actions = self.actions, []
+        for endpoint, payload, delay, fallback in actions:
+            if endpoint is not None:
+                t0 = time.perf_counter()
+                res = self._send(endpoint, payload)
+                if res["status"] == "error" and fallback:
+                    endpoint, payload = fallback
+                    res = self._send(endpoint, payload)
+                res["endpoint"] = endpoint
+                res["elapsed"] = round(time.perf_counter() - t0, 4)
+                results.append(res)
+                if res["status"] == "error" and self.stop_on_error: break
+            if delay: time.sleep(delay)
+        self.results.extend(results)
+        return results
@@ -0,0 +1,176 @@
+import hashlib
+import io
+import json
+import os
+import socket
+import sys
+import time
+
+import wifi_config
+from droidrun_transport import cache_dir, device_key
+
+# --- CLIENT DAEMON ---
+# Every `python openclaw_mcp.py <cmd>` is a fresh process: interpreter, imports
+# (requests alone is ~130 ms) and a new TCP connection to the Portal. The
+# daemon keeps one MCPForMe alive (pooled keep-alive connection, display size,
+# snapshot cache) behind a Unix socket; openclaw_mcp.py forwards its argv here
+# when the socket answers and runs the command itself otherwise.
+#
+# Protocol: one JSON line per connection each way
+#   -> {"argv": ["openclaw_mcp.py", "tap", "10", "10"]}   (or {"op": "status"|"stop"})
+#   <- {"output": "{'status': 'success', ...}\n", "code": 0}
+#
+# The socket name is derived from the Portal address + API key, so a daemon
+# never serves a wifi_config.py that points at another phone.
+
+NO_DAEMON_ENV = "OPENCLAW_NO_DAEMON"  # set to run every command in-process
+CLIENT_TIMEOUT = 60                   # seconds to wait for a forwarded command
+
+def socket_path(ip=None, port=None, api_key=None):
+    ip = ip or wifi_config.TARGET_IP
+    port = port or wifi_config.TARGET_PORT
+    api_key = api_key or wifi_config.API_KEY
+    tag = hashlib.sha1(device_key(f"http://{ip}:{port}", api_key).encode()).hexdigest()[:10]
+    return os.path.join(cache_dir(), f"openclaw-{tag}.sock")
+
+def _request(path, message, timeout=CLIENT_TIMEOUT):
+    """Send one message; None if no daemon is listening on `path`."""
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path): return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    # Past this point the daemon may already be running the command: report, never re-run it locally
+    with sock:
+        try:
+            sock.sendall(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+            data = sock.makefile("rb").readline()
+            return json.loads(data) if data else {"output": "Error: daemon closed the connection\n", "code": 1}
+        except (OSError, ValueError) as e:
+            return {"output": f"Error: daemon did not answer: {e}\n", "code": 1}
+
+def forward(argv, path=None):
+    """Run a CLI command on the daemon: {"output", "code"}, or None when no daemon is running."""
+    if os.environ.get(NO_DAEMON_ENV): return None
+    return _request(path or socket_path(), {"argv": list(argv)})
+
+
+# --- SERVER ---
+class Daemon:
+    def __init__(self, path, idle_timeout=0):
+        self.path = path
+        # Client first: if it can't be created, no socket is left behind for clients to hit
+        from openclaw_mcp import MCPForMe, run_command
+        self.mcp = MCPForMe()
+        self.run_command = run_command
+        self.server = self._bind()
+        self.idle_timeout = idle_timeout
+        self.started = time.time()
+        self.last_active = self.started
+        self.served = 0
+        self.running = False
+
+    def handle(self, message):
+        op = message.get("op", "run")
+        if op == "status":
+            return {"output": json.dumps(self.status(), ensure_ascii=False) + "\n", "code": 0}
+        if op == "stop":
+            self.running = False
+            return {"output": "stopped\n", "code": 0}
+        argv = message.get("argv") or []
+        if len(argv) < 2: return {"output": "Error: empty command\n", "code": 1}
+        out = io.StringIO()
+        code = 0
+        try:
+            self.run_command(self.mcp, argv, out)
+        except Exception as e:
+            print(f"Error: {type(e).__name__}: {e}", file=out)
+            code = 1
+        self.served += 1
+        return {"output": out.getvalue(), "code": code}
+
+    def status(self):
+        return {"pid": os.getpid(), "device": self.mcp.base_url, "socket": self.path,
+                "uptime_s": round(time.time() - self.started, 1), "served": self.served,
+                "display_size": self.mcp.transport._display_size or None}
+
+    def _bind(self):
+        if os.path.exists(self.path):
+            if _request(self.path, {"op": "status"}, timeout=2) is not None:
+                raise RuntimeError(f"a daemon is already running on {self.path}")
+            os.unlink(self.path)  # left behind by a daemon that was killed
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # The socket drives the phone: owner only, from the moment it exists
+        old_umask = os.umask(0o177)
+        try:
+            server.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        server.listen(16)
+        return server
+
+    def serve(self):
+        """Answer one connection at a time (commands to one phone run in order) until stopped or idle."""
+        server = self.server
+        server.settimeout(1.0)
+        self.running = True
+        try:
+            while self.running:
+                if self.idle_timeout and time.time() - self.last_active > self.idle_timeout: break
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                with conn:
+                    conn.settimeout(CLIENT_TIMEOUT)
+                    try:
+                        line = conn.makefile("rb").readline()
+                        reply = self.handle(json.loads(line))
+                        conn.sendall(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+                    except (OSError, ValueError) as e:
+                        print(f"⚠️ client error: {e}", file=sys.stderr)
+                self.last_active = time.time()
+        finally:
+            server.close()
+            try: os.unlink(self.path)
+            except OSError: pass
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Keep an MCPForMe connection alive for openclaw_mcp.py CLI calls")
+    parser.add_argument("action", nargs="?", default="start", choices=["start", "stop", "status"])
+    parser.add_argument("--socket", help="Unix socket path (default: per device, under ~/.cache/droidrun)")
+    parser.add_argument("--idle", type=float, default=0, help="exit after this many idle seconds (0 = never)")
+    args = parser.parse_args()
+    if not hasattr(socket, "AF_UNIX"):
+        print("Error: Unix sockets are not available on this platform")
+        sys.exit(1)
+    path = args.socket or socket_path()
+
+    if args.action != "start":
+        reply = _request(path, {"op": args.action}, timeout=5)
+        if reply is None:
+            print("not running")
+            sys.exit(1)
+        sys.stdout.write(reply["output"])
+        return
+
+    import signal
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))  # runs serve()'s cleanup (socket file)
+    try:
+        daemon = Daemon(path, args.idle)
+        print(f"🟢 openclaw daemon for {daemon.mcp.base_url} on {path} (Ctrl+C to stop)")
+        daemon.serve()
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,34 @@
-import time
 import sys
 import json
 import re
-from mcpforme import MCPForMe
+try:
+    from openclaw_mcp import MCPForMe
+except ImportError:
+    from mcpforme import MCPForMe # older installs shipped the module under this name
+from wifi_wait import WaitEngine
+from screen_coords import scale_point
+from ui_tree import UITree, compile_selector
 
-def find_node(nodes, criteria):
-    best_node = None
-    best_score = 0
-    
-    t_text = criteria.get("text")
-    t_desc = criteria.get("contentDescription")
-    t_id = criteria.get("resourceId")
-    
-    # Flatten tree
-    flat_nodes = []
-    def traverse(n):
-        if isinstance(n, list): 
-            for i in n: traverse(i)
-        elif isinstance(n, dict):
-            flat_nodes.append(n)
-            traverse(n.get("children") or n.get("subnodes"))
-    
-    traverse(nodes)
+LINE_PACKAGE = "jp.naver.line.android"
+# Where SEND sits when it can't be found: measured on a 1080x2340 phone, rescaled per device
+SEND_FALLBACK = (1008, 2139)
+SEND_FALLBACK_SIZE = (1080, 2340)
 
-    for node in flat_nodes:
-        score = 0
-        n_text = node.get("text")
-        n_desc = node.get("contentDescription")
-        n_id = node.get("resourceId")
+# Bottom bar of the chat room, resolved together on one snapshot taken after
+# typing (the keyboard moves it): SEND, and the message box whose row SEND sits on
+ROOM_SELECTORS = {
+    "send": compile_selector({"text": "Send"}),
+    "input": compile_selector({"classRegex": "EditText$", "region": [0, 0.5, 1, 1]}),
+}
 
-        if t_text and n_text == t_text: score += 3
-        if t_desc and n_desc == t_desc: score += 3
-        if t_id and n_id and t_id in n_id: score += 2
-        if t_text and n_text and t_text in n_text: score += 1
-        
-        if score > best_score:
-            best_score = score
-            best_node = node
-    
-    return best_node if best_score >= 2 else None
+def find_node(nodes, criteria):
+    # resourceId matches as a substring here (e.g. just "send_button")
+    return UITree(nodes).find_node(criteria, id_match="contains")
+
+def find_nodes(nodes, selectors):
+    """Best node per selector name (None when missing), all from one pass over `nodes`."""
+    found = UITree(nodes).find_many(selectors, id_match="contains", limit=1)
+    return {name: matches[0].node if matches else None for name, matches in found.items()}
 
 def get_center(node):
     if not node: return None, None
@@ -62,12 +52,13 @@ def main():
     target_name = sys.argv[1]
     message = sys.argv[2]
     mcp = MCPForMe()
+    waits = WaitEngine(mcp.transport)
 
     print(f"--- Starting LINE Send Mission: To '{target_name}' ---")
     
     # 1. Back to Home and Launch LINE
     mcp.global_action(2) # HOME
-    time.sleep(1)
+    waits.wait_for_idle(timeout=1)
     
     # Check current screen first
     print("Checking current screen for LINE...")
@@ -78,28 +69,26 @@ def main():
     if not line_node:
         print("Finding LINE icon via swipe...")
         mcp.swipe_dir("left")
-        time.sleep(1)
+        waits.wait_for_idle(timeout=1)
         mcp.swipe_dir("left")
-        time.sleep(1)
+        waits.wait_for_idle(timeout=1)
         dump = mcp.dump_ui()
         nodes = dump.get("data", {}).get("result_parsed", [])
         line_node = find_node(nodes, {"text": "LINE"})
     
     if not line_node:
         print("Error: LINE icon not found. Attempting shell launch...")
-        mcp.launch("jp.naver.line.android")
+        mcp.launch(LINE_PACKAGE)
     else:
         cx, cy = get_center(line_node)
         print(f"Tapping LINE icon at ({cx}, {cy})")
         mcp.tap(cx, cy)
     
     print("LINE opening. Waiting for chat list...")
-    time.sleep(4)
+    waits.wait_for_app(LINE_PACKAGE, timeout=4)
 
-    # 2. Find Chat Room
-    dump = mcp.dump_ui()
-    nodes = dump.get("data", {}).get("result_parsed", [])
-    chat_node = find_node(nodes, {"text": target_name})
+    # 2. Find Chat Room (returns as soon as it is on screen)
+    chat_node = waits.wait_for_node({"text": target_name}, timeout=4, matcher=find_node)
     
     if not chat_node:
         print(f"Error: Chat room '{target_name}' not found in list.")
@@ -108,35 +97,39 @@ def main():
     cx, cy = get_center(chat_node)
     mcp.tap(cx, cy)
     print(f"Entered chat: {target_name}. Waiting...")
-    time.sleep(1)
+    waits.wait_for_idle(timeout=1)
 
     # 3. Find Input Field and Type
     mcp.type_text(message)
     print(f"Typed message: {message}")
-    time.sleep(1)
 
-    # 4. Find SEND button
+    # 4. Find SEND button (appears once the input box has text)
     print("Searching for SEND button...")
-    dump = mcp.dump_ui()
-    nodes = dump.get("data", {}).get("result_parsed", [])
-    send_node = find_node(nodes, {"text": "Send"})
+    room = {}
+    def find_send(nodes, selectors):
+        room.update(find_nodes(nodes, selectors))
+        return room["send"]
+    send_node = waits.wait_for_node(ROOM_SELECTORS, timeout=2, matcher=find_send)
     
     if not send_node:
-        print("Error: Send button not found. Attempting backup coordinate (1008, 2139)...")
-        mcp.tap(1008, 2139)
+        x, y = scale_point(*SEND_FALLBACK, SEND_FALLBACK_SIZE, mcp.size)
+        input_y = get_center(room.get("input"))[1]
+        if input_y: y = input_y # on the message box's row, wherever the keyboard put it
+        print(f"Error: Send button not found. Attempting backup coordinate ({x}, {y})...")
+        mcp.tap(x, y)
     else:
         cx, cy = get_center(send_node)
         mcp.tap(cx, cy)
         print(f"Send button clicked at {cx}, {cy}")
 
-    time.sleep(1)
+    waits.wait_for_idle(timeout=1)
 
     # 5. Cleanup
     print("Mission complete. Returning Home...")
     mcp.global_action(1) # BACK
-    time.sleep(1)
+    waits.wait_for_idle(timeout=1)
     mcp.global_action(2) # HOME
-    time.sleep(1)
+    waits.wait_for_idle(timeout=1)
     print("Done.")
 
 if __name__ == "__main__":
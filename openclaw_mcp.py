@@ -1,9 +1,9 @@
-import requests
 import json
 import base64
 import time
 import sys
 import os
+from contextlib import contextmanager
 
 # Import local config
 try:
@@ -12,46 +12,42 @@ except ImportError:
     print("Error: wifi_config.py not found.")
     sys.exit(1)
 
+from droidrun_transport import get_transport, ActionQueue
+from screen_coords import REFERENCE_SIZE, swipe_points
+
 class MCPForMe:
     def __init__(self):
-        self.base_url = f"http://{wifi_config.TARGET_IP}:{wifi_config.TARGET_PORT}"
-        self.headers = {
-            "Authorization": f"Bearer {wifi_config.API_KEY}",
-            "Content-Type": "application/json"
-        }
-        self.width = 1080
-        self.height = 2340
-        self._init_device_info()
-
-    def _init_device_info(self):
-        try:
-            resp = requests.get(f"{self.base_url}/phone_state", headers=self.headers, timeout=3)
-            if resp.status_code == 200:
-                data = resp.json()
-                if "result" in data and isinstance(data["result"], str):
-                    try:
-                        inner = json.loads(data["result"])
-                        data.update(inner)
-                    except: pass
-                self.width = data.get("displayWidth", 1080)
-                self.height = data.get("displayHeight", 2340)
-        except: pass
-
-    def _post(self, endpoint, payload=None, timeout=10):
-        url = f"{self.base_url}{endpoint}"
+        self.transport = get_transport(wifi_config.TARGET_IP, wifi_config.TARGET_PORT, wifi_config.API_KEY)
+        self.base_url = self.transport.base_url
+        self._queue = None
+
+    # --- SCREEN SIZE (read once per device, on first use) ---
+    @property
+    def size(self):
+        return self.transport.display_size() or REFERENCE_SIZE
+
+    @property
+    def width(self): return self.size[0]
+
+    @property
+    def height(self): return self.size[1]
+
+    def _post(self, endpoint, payload=None, timeout=10, fallback=None):
+        if self._queue is not None:
+            self._queue.add(endpoint, payload, fallback=fallback)
+            return {"status": "queued"}
         try:
-            resp = requests.post(url, json=payload or {}, headers=self.headers, timeout=timeout)
+            resp = self.transport.post(endpoint, payload or {}, timeout=timeout)
             resp.raise_for_status()
             return {"status": "success", "data": resp.json() if resp.text else None}
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
     def _get(self, endpoint, timeout=15):
-        url = f"{self.base_url}{endpoint}"
         try:
-            resp = requests.get(url, headers=self.headers, timeout=timeout)
+            resp = self.transport.get(endpoint, timeout=timeout)
             resp.raise_for_status()
-            data = resp.json()
+            data = json.loads(resp.content)
             if "result" in data and isinstance(data["result"], str):
                 try:
                     data["result_parsed"] = json.loads(data["result"])
@@ -60,6 +56,27 @@ class MCPForMe:
         except Exception as e:
             return {"status": "error", "message": str(e)}
 
+    # --- BATCH ---
+    @contextmanager
+    def batch(self, stop_on_error=False):
+        """Queue every action issued inside the block, then send them in order.
+
+            with mcp.batch() as q:
+                mcp.global_action(2); mcp.sleep(1); mcp.swipe_dir("left")
+            print(q.results)
+        """
+        queue = ActionQueue(self.transport, stop_on_error)
+        self._queue = queue
+        try:
+            yield queue
+        finally:
+            self._queue = None
+        queue.flush()
+
+    def sleep(self, seconds):
+        if self._queue is not None: self._queue.sleep(float(seconds))
+        else: time.sleep(float(seconds))
+
     # --- ACTIONS ---
     def global_action(self, action_id):
         """1: BACK, 2: HOME, 3: RECENTS, 4: NOTIFICATIONS"""
@@ -88,50 +105,60 @@ class MCPForMe:
         return self._post("/action/swipe", {"startX": int(x1), "startY": int(y1), "endX": int(x2), "endY": int(y2), "duration": int(duration)})
 
     def swipe_dir(self, direction, duration=500):
-        cx, cy = self.width // 2, self.height // 2
-        dx, dy = self.width // 3, self.height // 3
-        if direction == "left": sx, sy, ex, ey = cx + dx, cy, cx - dx, cy
-        elif direction == "right": sx, sy, ex, ey = cx - dx, cy, cx + dx, cy
-        elif direction == "up": sx, sy, ex, ey = cx, cy + dy, cx, cy - dy
-        elif direction == "down": sx, sy, ex, ey = cx, cy - dy, cx, cy + dy
-        else: return {"status": "error", "message": f"Invalid direction: {direction}"}
-        return self.swipe(sx, sy, ex, ey, duration)
+        points = swipe_points(direction, self.size)
+        if points is None: return {"status": "error", "message": f"Invalid direction: {direction}"}
+        return self.swipe(*points, duration)
 
     def launch(self, package):
-        res = self._post("/action/launch", {"package": package})
+        monkey = ("/action/shell", {"command": f"monkey -p {package} -c android.intent.category.LAUNCHER 1"})
+        # Inside batch() the result is deferred, so the queue sends the fallback itself
+        res = self._post("/action/launch", {"package": package}, fallback=monkey)
         if res["status"] == "error":
-            return self._post("/action/shell", {"command": f"monkey -p {package} -c android.intent.category.LAUNCHER 1"})
+            return self._post(*monkey)
         return res
 
 # CLI Wrapper
+USAGE = "Usage: python3 mcpforme.py [home|back|recents|dump|tap x y|long x y [ms]|type 'text'|clear|key code|swipe x1 y1 x2 y2 [ms]|swipe left|right|up|down [ms]|launch pkg]"
+
+def run_command(mcp, argv, out=None):
+    """Run one CLI command (argv as in sys.argv) on `mcp`, printing to `out` (default stdout)."""
+    out = out or sys.stdout
+    cmd = argv[1].lower()
+    if cmd == "home": print(mcp.global_action(2), file=out)
+    elif cmd == "back": print(mcp.global_action(1), file=out)
+    elif cmd == "recents": print(mcp.global_action(3), file=out)
+    elif cmd == "dump": print(json.dumps(mcp.dump_ui(), indent=2, ensure_ascii=False), file=out)
+    elif cmd == "clear": print(mcp.clear_text(), file=out)
+    elif cmd == "tap" and len(argv) == 4:
+        print(mcp.tap(argv[2], argv[3]), file=out)
+    elif cmd == "long" and len(argv) >= 4:
+        dur = argv[4] if len(argv) == 5 else 1000
+        print(mcp.long_press(argv[2], argv[3], dur), file=out)
+    elif cmd == "type" and len(argv) == 3:
+        print(mcp.type_text(argv[2]), file=out)
+    elif cmd == "key" and len(argv) == 3:
+        print(mcp.press_key(argv[2]), file=out)
+    elif cmd == "swipe" and len(argv) >= 3 and argv[2] in ["left", "right", "up", "down"]:
+        dur = argv[3] if len(argv) == 4 else 500
+        print(mcp.swipe_dir(argv[2], dur), file=out)
+    elif cmd == "swipe" and len(argv) >= 6:
+        dur = argv[6] if len(argv) == 7 else 300
+        print(mcp.swipe(argv[2], argv[3], argv[4], argv[5], dur), file=out)
+    elif cmd == "launch" and len(argv) == 3:
+        print(mcp.launch(argv[2]), file=out)
+    else:
+        print(f"Unknown command or wrong arguments: {cmd}", file=out)
+
 if __name__ == "__main__":
-    mcp = MCPForMe()
     if len(sys.argv) < 2:
-        print("Usage: python3 mcpforme.py [home|back|recents|dump|tap x y|long x y [ms]|type 'text'|clear|key code|swipe x1 y1 x2 y2 [ms]|swipe left|right|up|down [ms]|launch pkg]")
+        print(USAGE)
         sys.exit(1)
 
-    cmd = sys.argv[1].lower()
-    if cmd == "home": print(mcp.global_action(2))
-    elif cmd == "back": print(mcp.global_action(1))
-    elif cmd == "recents": print(mcp.global_action(3))
-    elif cmd == "dump": print(json.dumps(mcp.dump_ui(), indent=2, ensure_ascii=False))
-    elif cmd == "clear": print(mcp.clear_text())
-    elif cmd == "tap" and len(sys.argv) == 4:
-        print(mcp.tap(sys.argv[2], sys.argv[3]))
-    elif cmd == "long" and len(sys.argv) >= 4:
-        dur = sys.argv[4] if len(sys.argv) == 5 else 1000
-        print(mcp.long_press(sys.argv[2], sys.argv[3], dur))
-    elif cmd == "type" and len(sys.argv) == 3:
-        print(mcp.type_text(sys.argv[2]))
-    elif cmd == "key" and len(sys.argv) == 3:
-        print(mcp.press_key(sys.argv[2]))
-    elif cmd == "swipe" and len(sys.argv) >= 3 and sys.argv[2] in ["left", "right", "up", "down"]:
-        dur = sys.argv[3] if len(sys.argv) == 4 else 500
-        print(mcp.swipe_dir(sys.argv[2], dur))
-    elif cmd == "swipe" and len(sys.argv) >= 6:
-        dur = sys.argv[6] if len(sys.argv) == 7 else 300
-        print(mcp.swipe(sys.argv[2], sys.argv[3], sys.argv[4], sys.argv[5], dur))
-    elif cmd == "launch" and len(sys.argv) == 3:
-        print(mcp.launch(sys.argv[2]))
-    else:
-        print(f"Unknown command or wrong arguments: {cmd}")
+    # A running openclaw_daemon.py already has the connection and device info: hand the command over
+    from openclaw_daemon import forward
+    reply = forward(sys.argv)
+    if reply is not None:
+        sys.stdout.write(reply["output"])
+        sys.exit(reply.get("code", 0))
+
+    run_command(MCPForMe(), sys.argv)
@@ -0,0 +1,159 @@
+import asyncio
+import base64
+import json
+import sys
+
+# Import local config
+try:
+    import wifi_config
+except ImportError:
+    print("Error: wifi_config.py not found.")
+    sys.exit(1)
+
+from droidrun_screenshot import FrameCache, Frame
+from droidrun_transport import AsyncDroidRunTransport
+from screen_coords import REFERENCE_SIZE, swipe_points
+
+class AsyncMCPForMe:
+    """asyncio version of MCPForMe: same methods, but every call is awaitable.
+
+    Independent reads can run concurrently, e.g.
+        state, tree = await asyncio.gather(mcp.phone_state(), mcp.dump_ui())
+    """
+
+    def __init__(self, ip=None, port=None, api_key=None):
+        ip = ip or wifi_config.TARGET_IP
+        port = port or wifi_config.TARGET_PORT
+        api_key = api_key or wifi_config.API_KEY
+        self.transport = AsyncDroidRunTransport(ip, port, api_key)
+        self.base_url = self.transport.base_url
+        self.frames = FrameCache() # last screenshot of this device
+        self.width, self.height = REFERENCE_SIZE
+
+    async def __aenter__(self):
+        await self.init_device_info()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self.transport.close()
+
+    async def init_device_info(self):
+        self.width, self.height = await self.screen_size()
+
+    async def screen_size(self):
+        """(width, height) of the device, read once per transport."""
+        return await self.transport.display_size() or REFERENCE_SIZE
+
+    async def _post(self, endpoint, payload=None, timeout=10):
+        try:
+            resp = await self.transport.post(endpoint, payload or {}, timeout=timeout)
+            resp.raise_for_status()
+            return {"status": "success", "data": resp.json() if resp.text else None}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def _get(self, endpoint, timeout=15):
+        try:
+            resp = await self.transport.get(endpoint, timeout=timeout)
+            resp.raise_for_status()
+            data = json.loads(resp.content)
+            if "result" in data and isinstance(data["result"], str):
+                try:
+                    data["result_parsed"] = json.loads(data["result"])
+                except: pass
+            return {"status": "success", "data": data}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    # --- ACTIONS ---
+    async def global_action(self, action_id):
+        """1: BACK, 2: HOME, 3: RECENTS, 4: NOTIFICATIONS"""
+        return await self._post("/action/global", {"action": action_id})
+
+    async def tap(self, x, y):
+        return await self._post("/action/tap", {"x": int(x), "y": int(y)})
+
+    async def long_press(self, x, y, duration=1000):
+        return await self._post("/action/swipe", {"startX": int(x), "startY": int(y), "endX": int(x), "endY": int(y), "duration": int(duration)})
+
+    async def type_text(self, text):
+        b64_text = base64.b64encode(text.encode('utf-8')).decode('utf-8')
+        return await self._post("/keyboard/input", {"base64_text": b64_text})
+
+    async def clear_text(self):
+        return await self._post("/keyboard/clear")
+
+    async def press_key(self, key_code):
+        return await self._post("/keyboard/key", {"key_code": int(key_code)})
+
+    async def swipe(self, x1, y1, x2, y2, duration=300):
+        return await self._post("/action/swipe", {"startX": int(x1), "startY": int(y1), "endX": int(x2), "endY": int(y2), "duration": int(duration)})
+
+    async def swipe_dir(self, direction, duration=500):
+        points = swipe_points(direction, await self.screen_size())
+        if points is None: return {"status": "error", "message": f"Invalid direction: {direction}"}
+        return await self.swipe(*points, duration)
+
+    async def launch(self, package):
+        res = await self._post("/action/launch", {"package": package})
+        if res["status"] == "error":
+            return await self._post("/action/shell", {"command": f"monkey -p {package} -c android.intent.category.LAUNCHER 1"})
+        return res
+
+    async def stop_app(self, package):
+        return await self._post("/action/stop_app", {"packageName": package})
+
+    # --- READS (safe to run concurrently) ---
+    async def dump_ui(self):
+        return await self._get("/a11y_tree")
+
+    async def state_full(self):
+        return await self._get("/state_full")
+
+    async def phone_state(self):
+        return await self._get("/phone_state")
+
+    async def device_info(self):
+        """Resolution plus /phone_state; the state is cached until the next action on this device."""
+        state = await self.transport.get_snapshot("/phone_state")
+        info = {"resolution": list(await self.screen_size())}
+        if isinstance(state, dict): info.update(state)
+        return info
+
+    async def packages(self):
+        return await self._get("/packages")
+
+    async def screenshot(self):
+        try:
+            resp = await self.transport.get("/screenshot")
+            resp.raise_for_status()
+            return {"status": "success", "data": resp.content, "content_type": resp.headers.get("Content-Type")}
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    async def screenshot_frame(self):
+        """Fetch /screenshot as a Frame and make it the device's last frame; returns (frame, previous)."""
+        resp = await self.transport.get("/screenshot")
+        resp.raise_for_status()
+        frame = Frame.from_response(resp.content, resp.headers.get("Content-Type"))
+        return frame, self.frames.put(frame)
+
+    async def snapshot(self):
+        """Fetch /phone_state, /a11y_tree and /screenshot in parallel."""
+        state, tree, shot = await asyncio.gather(self.phone_state(), self.dump_ui(), self.screenshot())
+        return {"phone_state": state, "a11y_tree": tree, "screenshot": shot}
+
+# CLI Wrapper (concurrent snapshot of one device)
+async def _main():
+    async with AsyncMCPForMe() as mcp:
+        snap = await mcp.snapshot()
+        shot = snap["screenshot"]
+        if shot["status"] == "success":
+            snap["screenshot"] = {"status": "success", "bytes": len(shot["data"])}
+        print(json.dumps(snap, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,36 @@
+# --- SCREEN COORDINATES ---
+# A recorded point is stored as pixels plus the resolution it was taken on
+# ("resolution": [w, h]), i.e. the normalized point (x / w, y / h). Playback
+# maps it onto each device's real displayWidth/displayHeight, read once per
+# device (DroidRunTransport.display_size), so one recording runs on phones of
+# any size.
+
+# Used only when a device's size can't be read
+REFERENCE_SIZE = (1080, 2400)
+
+# Directional swipes: from the screen center, a third of the screen each way
+SWIPE_SPAN = 1 / 3
+
+def normalize(x, y, size):
+    """Pixels -> fractions of the screen (0..1)."""
+    return round(x / size[0], 4), round(y / size[1], 4)
+
+def denormalize(nx, ny, size):
+    """Fractions of the screen -> pixels on a screen of `size`."""
+    return round(nx * size[0]), round(ny * size[1])
+
+def scale_point(x, y, recorded, current):
+    """Map a point recorded at resolution `recorded` (w, h) onto `current`."""
+    if not recorded or not current or tuple(recorded) == tuple(current): return x, y
+    return denormalize(x / recorded[0], y / recorded[1], current)
+
+def swipe_points(direction, size):
+    """(sx, sy, ex, ey) of a left/right/up/down swipe on a screen of `size`; None if unknown."""
+    w, h = size
+    cx, cy = w // 2, h // 2
+    dx, dy = round(w * SWIPE_SPAN), round(h * SWIPE_SPAN)
+    if direction == "left": return cx + dx, cy, cx - dx, cy
+    if direction == "right": return cx - dx, cy, cx + dx, cy
+    if direction == "up": return cx, cy + dy, cx, cy - dy
+    if direction == "down": return cx, cy - dy, cx, cy + dy
+    return None
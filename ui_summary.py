@@ -0,0 +1,106 @@
+import zlib
+
+from ui_tree import UITree, node_keys
+
+# --- SCREEN SUMMARY (for LLM agents) ---
+# A bounded text table of what can be read or touched on screen, instead of
+# the raw a11y JSON. Each row gets a short id derived from the node's stable
+# key (see ui_tree.node_keys), so the same element keeps its id across
+# re-dumps of the same screen and tap_element(id) can resolve it later.
+
+MAX_ROWS = 60
+MAX_LABEL = 40
+
+# Flags the Portal may send for nodes that react to input
+ACTION_FLAGS = ("clickable", "isClickable", "longClickable", "isLongClickable", "editable", "isEditable",
+                "checkable", "isCheckable", "scrollable", "isScrollable")
+ACTION_CLASSES = ("Button", "EditText", "CheckBox", "Switch", "RadioButton", "SeekBar", "Spinner")
+HIDDEN_FLAGS = ("visibleToUser", "isVisibleToUser")
+
+def _short_id(key):
+    # 4 base36 chars from a hash of the key: ~1.7M values, collisions resolved below
+    n = zlib.crc32(repr(key).encode()) % (36 ** 4)
+    out = ""
+    for _ in range(4):
+        n, r = divmod(n, 36)
+        out = "0123456789abcdefghijklmnopqrstuvwxyz"[r] + out
+    return out
+
+def element_ids(tree):
+    """Short stable id per node (same order as the tree)."""
+    ids, taken = [], set()
+    for key in node_keys(tree):
+        sid = _short_id(key)
+        n = 1
+        while sid in taken:
+            n += 1
+            sid = f"{_short_id(key)}{n}"
+        taken.add(sid)
+        ids.append(sid)
+    return ids
+
+def resolve_id(tree, element_id):
+    """Node index for an id from summarize(), or None if it's not on this screen."""
+    element_id = element_id.strip().lower()
+    for i, sid in enumerate(element_ids(tree)):
+        if sid == element_id: return i
+    return None
+
+def _interactive(node, cls):
+    if any(node.get(k) for k in ACTION_FLAGS): return True
+    return bool(cls) and cls.endswith(ACTION_CLASSES)
+
+def summarize(tree, screen=None):
+    """Pruned rows [{"i", "id", "label", "type", "center"}] for a UITree (or raw root).
+
+    Drops nodes without area, off-screen or flagged invisible, and nodes that
+    neither show a label nor react to input. Wrapper containers collapse: a
+    label inside an interactive ancestor is merged into that ancestor's row,
+    so a clickable list item with three TextViews becomes one row.
+    """
+    if not isinstance(tree, UITree): tree = UITree(tree)
+    n = len(tree)
+    if screen is None:
+        first = next((i for i in range(n) if tree.has_bounds[i]), None)
+        screen = tree.bounds_of(first)[2:] if first is not None else None
+    ids = element_ids(tree)
+
+    rows = {}       # node index -> row
+    owner = [-1] * n  # nearest interactive ancestor that got a row
+    for i in range(n):
+        node = tree.node(i)
+        p = tree.parent[i]
+        owner[i] = owner[p] if p >= 0 else -1
+        if not tree.has_bounds[i]: continue
+        l, t, r, b = tree.bounds[4 * i:4 * i + 4]
+        if r <= l or b <= t: continue
+        if screen and (r <= 0 or b <= 0 or l >= screen[0] or t >= screen[1]): continue
+        if any(node.get(k) is False for k in HIDDEN_FLAGS): continue
+
+        label = tree.text[i] or tree.desc[i]
+        cls = tree.cls[i] or ""
+        if _interactive(node, cls):
+            rows[i] = {"i": i, "id": ids[i], "label": label or "", "type": cls.split(".")[-1],
+                       "center": tree.center(i)}
+            owner[i] = i
+        elif label:
+            if owner[i] >= 0:
+                row = rows[owner[i]]
+                row["label"] = f"{row['label']} / {label}" if row["label"] else label
+            else:
+                rows[i] = {"i": i, "id": ids[i], "label": label, "type": cls.split(".")[-1] or "View",
+                           "center": tree.center(i)}
+    for i, row in rows.items():
+        if not row["label"] and tree.rid[i]: row["label"] = f"#{tree.rid[i].split('/')[-1]}"
+    return [rows[i] for i in sorted(rows)]
+
+def render_summary(rows, max_rows=MAX_ROWS, max_label=MAX_LABEL):
+    """Compact text table (bounded like print_list_table in wifi_recorder, but sized for a prompt)."""
+    lines = [f"{len(rows)} elements (tap with tap_element(id))", "ID   | TYPE         | CENTER      | LABEL"]
+    for row in rows[:max_rows]:
+        label = row["label"].replace("\n", " ")
+        if len(label) > max_label: label = label[:max_label - 1] + "…"
+        cx, cy = row["center"]
+        lines.append(f"{row['id']:<4} | {row['type'][:12]:<12} | {f'{cx},{cy}':<11} | {label}")
+    if len(rows) > max_rows: lines.append(f"... {len(rows) - max_rows} more")
+    return "\n".join(lines)
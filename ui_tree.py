@@ -0,0 +1,410 @@
+import hashlib
+import json
+import re
+from array import array
+from collections import namedtuple
+
+_NUM_RE = re.compile(r'-?\d+')
+
+def parse_bounds(node):
+    """[left, top, right, bottom] from boundsInScreen (dict) or bounds ("[l,t][r,b]"), else None."""
+    b = node.get("boundsInScreen")
+    if isinstance(b, dict):
+        return [b.get("left", 0), b.get("top", 0), b.get("right", 0), b.get("bottom", 0)]
+    b_str = node.get("bounds")
+    if isinstance(b_str, str):
+        m = _NUM_RE.findall(b_str)
+        if len(m) >= 4: return [int(x) for x in m[:4]]
+    return None
+
+def unwrap_payload(data):
+    """Portal wrapper -> tree root (handles `result` sent as stringified JSON)."""
+    root = (data.get("result") or data) if isinstance(data, dict) else data
+    if isinstance(root, str):
+        try: root = json.loads(root)
+        except ValueError: return None
+    return root
+
+def decode_payload(raw, object_hook=None):
+    """Raw Portal response body (bytes/str) -> tree root, in one pass per JSON layer.
+
+    Decodes straight from the body bytes (no resp.text copy, no re-wrapping)
+    and unwraps a stringified `result` immediately. `object_hook` sees every
+    object as soon as it is parsed, children before parents.
+    """
+    data = json.loads(raw, object_hook=object_hook)
+    root = (data.get("result") or data) if isinstance(data, dict) else data
+    if isinstance(root, str):
+        try: root = json.loads(root, object_hook=object_hook)
+        except ValueError: return None
+    return root
+
+
+class _NodeFound(Exception):
+    def __init__(self, node):
+        self.node = node
+
+def _occurs_once(raw, value):
+    """True when `value` appears exactly once, verbatim, in the raw body."""
+    needle = value if isinstance(raw, str) else value.encode()
+    first = raw.find(needle)
+    return first >= 0 and raw.find(needle, first + 1) < 0
+
+def scan_payload(raw, criteria, id_match="exact"):
+    """Decode a raw response body, stopping as soon as `criteria` is matched exactly.
+
+    The parse sees children before their parents, while UITree.find() breaks
+    ties towards the ancestor, so the early stop is only taken when the most
+    selective criterion (text, else contentDescription, else resourceId)
+    occurs once in the body: then no other node can match as well. The first
+    such node aborts the parse and (node, None) is returned; otherwise
+    (None, root) with the fully decoded payload, ready for the usual scored search.
+    """
+    t_text = criteria.get("text")
+    t_desc = criteria.get("contentDescription")
+    t_id = criteria.get("resourceId")
+    if not (t_text or t_desc or t_id): return None, decode_payload(raw)
+    if not _occurs_once(raw, t_text or t_desc or t_id): return None, decode_payload(raw)
+
+    def hook(d):
+        if t_text and d.get("text") != t_text: return d
+        if t_desc and d.get("contentDescription") != t_desc: return d
+        if t_id:
+            rid = d.get("resourceId")
+            if not rid or not (t_id in rid if id_match == "contains" else rid == t_id): return d
+        raise _NodeFound(d)
+
+    try:
+        return None, decode_payload(raw, object_hook=hook)
+    except _NodeFound as found:
+        return found.node, None
+
+
+class UITree:
+    """One parsed /a11y_tree snapshot, flattened once and indexed for lookups.
+
+    Nodes keep the pre-order numbering used by the recorder's `idx <N>`.
+    Attributes live in parallel columns (lists/arrays), with hash indexes on
+    text, contentDescription and resourceId, so repeated find() calls against
+    the same snapshot don't rescan the whole tree.
+    """
+
+    __slots__ = ("nodes", "text", "desc", "rid", "cls", "parent", "bounds", "centers",
+                 "has_bounds", "_by_text", "_by_desc", "_by_id", "_fingerprint", "_end")
+
+    def __init__(self, root):
+        self.nodes = []             # raw node dicts, pre-order
+        self.text = []
+        self.desc = []
+        self.rid = []
+        self.cls = []
+        self.parent = array('i')    # parent index, -1 for roots
+        self.bounds = array('i')    # l, t, r, b per node
+        self.centers = array('i')   # cx, cy per node
+        self.has_bounds = bytearray()
+        self._by_text = {}
+        self._by_desc = {}
+        self._by_id = {}
+        self._fingerprint = None    # screen_fingerprint(), computed on first use
+        self._end = None            # last descendant index per node, computed on first use
+
+        # Iterative pre-order walk (same order as the recursive flatten)
+        stack = [(root, -1)]
+        while stack:
+            n, parent = stack.pop()
+            if isinstance(n, list):
+                for child in reversed(n): stack.append((child, parent))
+                continue
+            if not isinstance(n, dict): continue
+            self._add(n, parent)
+            children = n.get("children") or n.get("subnodes")
+            if children: stack.append((children, len(self.nodes) - 1))
+
+    @classmethod
+    def from_payload(cls, data):
+        return cls(unwrap_payload(data))
+
+    def _add(self, n, parent):
+        i = len(self.nodes)
+        self.nodes.append(n)
+        text, desc, rid = n.get("text"), n.get("contentDescription"), n.get("resourceId")
+        self.text.append(text)
+        self.desc.append(desc)
+        self.rid.append(rid)
+        self.cls.append(n.get("className"))
+        self.parent.append(parent)
+        if text: self._by_text.setdefault(text, []).append(i)
+        if desc: self._by_desc.setdefault(desc, []).append(i)
+        if rid: self._by_id.setdefault(rid, []).append(i)
+
+        b = parse_bounds(n)
+        if b:
+            self.bounds.extend(b)
+            self.centers.extend(((b[0] + b[2]) // 2, (b[1] + b[3]) // 2))
+            self.has_bounds.append(1)
+        else:
+            self.bounds.extend((0, 0, 0, 0))
+            self.centers.extend((0, 0))
+            self.has_bounds.append(0)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def node(self, i):
+        return self.nodes[i]
+
+    def bounds_of(self, i):
+        if not self.has_bounds[i]: return None
+        return list(self.bounds[4 * i:4 * i + 4])
+
+    def center(self, i):
+        if not self.has_bounds[i]: return None, None
+        return self.centers[2 * i], self.centers[2 * i + 1]
+
+    # --- LOOKUPS ---
+    def by_text(self, text):
+        return self._by_text.get(text, [])
+
+    def by_desc(self, desc):
+        return self._by_desc.get(desc, [])
+
+    def by_id(self, rid):
+        return self._by_id.get(rid, [])
+
+    def subtree_end(self, i):
+        """Index of the last node in i's subtree (pre-order: descendants are i+1..end)."""
+        if self._end is None:
+            end = array('i', range(len(self.nodes)))
+            for j in range(len(self.nodes) - 1, 0, -1):
+                p = self.parent[j]
+                if p >= 0 and end[j] > end[p]: end[p] = end[j]
+            self._end = end
+        return self._end[i]
+
+    def screen_size(self):
+        """(width, height) spanned by the nodes' bounds, or None."""
+        if not any(self.has_bounds): return None
+        return max(self.bounds[2::4]), max(self.bounds[3::4])
+
+    def _candidates(self, t_text, t_desc, t_id, id_match):
+        candidates = set()
+        if t_text: candidates.update(self._by_text.get(t_text, ()))
+        if t_desc: candidates.update(self._by_desc.get(t_desc, ()))
+        if t_id:
+            if id_match == "contains":
+                for rid, idxs in self._by_id.items():
+                    if t_id in rid: candidates.update(idxs)
+            else:
+                candidates.update(self._by_id.get(t_id, ()))
+        return candidates
+
+    def _score(self, i, t_text, t_desc, t_id, id_match):
+        score = 0
+        n_text, n_id = self.text[i], self.rid[i]
+        if t_text and n_text == t_text: score += 3
+        if t_desc and self.desc[i] == t_desc: score += 3
+        if t_id and n_id and (t_id in n_id if id_match == "contains" else n_id == t_id): score += 2
+        if t_text and n_text and t_text in n_text: score += 1
+        return score
+
+    def find(self, criteria, id_match="exact", threshold=2):
+        """Index of the best match for criteria, or None.
+
+        Scoring is the one every script already uses: exact text +3, exact
+        contentDescription +3, resourceId +2 (exact, or substring when
+        id_match="contains"), text substring +1; ties go to the earliest node.
+        Only nodes hit by an index can reach the threshold, so only those are scored.
+        """
+        t_text = criteria.get("text")
+        t_desc = criteria.get("contentDescription")
+        t_id = criteria.get("resourceId")
+
+        best, best_score = None, 0
+        for i in sorted(self._candidates(t_text, t_desc, t_id, id_match)):
+            score = self._score(i, t_text, t_desc, t_id, id_match)
+            if score > best_score:
+                best, best_score = i, score
+
+        return best if best_score >= threshold else None
+
+    def find_node(self, criteria, id_match="exact", threshold=2):
+        i = self.find(criteria, id_match, threshold)
+        return None if i is None else self.nodes[i]
+
+    def find_many(self, selectors, id_match="exact", limit=None):
+        """Resolve many selectors against this snapshot at once.
+
+        `selectors` maps a name to a criteria dict (or a compiled Selector).
+        Returns {name: [Match(index, score, node), ...]} ranked best first
+        (ties go to the earliest node), at most `limit` per name. Selectors
+        with text/contentDescription/resourceId only score the nodes their
+        indexes hit; all the others share a single walk over the tree.
+        """
+        results, scanning = {}, []
+        for name, sel in selectors.items():
+            sel = compile_selector(sel, id_match)
+            ctx = sel.bind(self)
+            candidates = sel.candidates(self)
+            if candidates is None:
+                scanning.append((name, sel, ctx))
+                results[name] = []
+                continue
+            hits = results[name] = []
+            for i in candidates:
+                score = sel.score(self, i, ctx)
+                if score is not None: hits.append((score, i))
+        if scanning:
+            for i in range(len(self.nodes)):
+                for name, sel, ctx in scanning:
+                    score = sel.score(self, i, ctx)
+                    if score is not None: results[name].append((score, i))
+
+        for name, hits in results.items():
+            hits.sort(key=lambda hit: (-hit[0], hit[1]))
+            results[name] = [Match(i, score, self.nodes[i]) for score, i in hits[:limit]]
+        return results
+
+
+# --- SELECTORS ---
+# A selector is a criteria dict. text / contentDescription / resourceId score
+# exactly as in UITree.find() and the total must reach `threshold` (default 2);
+# className is ignored, as in find(), so a recorded criteria dict resolves to
+# the same node either way. Every other key is a filter the node must pass,
+# worth +1 (the same for every match, so the ranking stays find()'s):
+#   textRegex, descRegex, idRegex   re.search() on text / contentDescription / resourceId
+#   classRegex                      re.search() on className, e.g. "EditText$"
+#   region                          [l, t, r, b] holding the node's center; fractions of the screen when all <= 1
+#   ancestor, descendant            a selector some ancestor / descendant must match
+
+Match = namedtuple("Match", "index score node")
+
+_REGEX_KEYS = (("textRegex", "text"), ("descRegex", "desc"), ("idRegex", "rid"), ("classRegex", "cls"))
+
+class Selector:
+    """A criteria dict compiled once into a matcher reusable across snapshots."""
+
+    __slots__ = ("criteria", "text", "desc", "rid", "id_match", "threshold", "regexes",
+                 "region", "ancestor", "descendant")
+
+    def __init__(self, criteria, id_match="exact"):
+        self.criteria = criteria
+        self.text = criteria.get("text")
+        self.desc = criteria.get("contentDescription")
+        self.rid = criteria.get("resourceId")
+        self.id_match = id_match
+        self.threshold = criteria.get("threshold", 2)
+        self.regexes = tuple((column, re.compile(criteria[key])) for key, column in _REGEX_KEYS if criteria.get(key))
+        self.region = tuple(criteria["region"]) if criteria.get("region") else None
+        self.ancestor = compile_selector(criteria["ancestor"], id_match) if criteria.get("ancestor") else None
+        self.descendant = compile_selector(criteria["descendant"], id_match) if criteria.get("descendant") else None
+
+    def candidates(self, tree):
+        """Indexes worth scoring on `tree`, or None when every node has to be checked."""
+        if not (self.text or self.desc or self.rid):
+            # Like find(): nothing to score and nothing to filter on matches no node
+            if not (self.regexes or self.region or self.ancestor or self.descendant): return ()
+            return None
+        return tree._candidates(self.text, self.desc, self.rid, self.id_match)
+
+    def bind(self, tree):
+        """Per-snapshot state: (region in pixels, ancestor mask, descendant mask)."""
+        region = self.region
+        if region and all(0 <= v <= 1 for v in region):
+            size = tree.screen_size()
+            region = (region[0] * size[0], region[1] * size[1], region[2] * size[0], region[3] * size[1]) if size else None
+        return (region,
+                self.ancestor.mask(tree) if self.ancestor else None,
+                self.descendant.mask(tree) if self.descendant else None)
+
+    def mask(self, tree):
+        """bytearray with 1 at every node this selector matches."""
+        mask = bytearray(len(tree))
+        for match in tree.find_many({0: self})[0]: mask[match.index] = 1
+        return mask
+
+    def score(self, tree, i, ctx):
+        """Score of node i, or None when it doesn't match."""
+        score = 0
+        if self.text or self.desc or self.rid:
+            score = tree._score(i, self.text, self.desc, self.rid, self.id_match)
+            if score < self.threshold: return None
+        for column, regex in self.regexes:
+            value = getattr(tree, column)[i]
+            if not value or not regex.search(value): return None
+            score += 1
+        region, up, down = ctx
+        if self.region:
+            if region is None or not tree.has_bounds[i]: return None
+            cx, cy = tree.centers[2 * i], tree.centers[2 * i + 1]
+            if not (region[0] <= cx <= region[2] and region[1] <= cy <= region[3]): return None
+            score += 1
+        if up is not None:
+            p = tree.parent[i]
+            while p >= 0 and not up[p]: p = tree.parent[p]
+            if p < 0: return None
+            score += 1
+        if down is not None:
+            if down.find(1, i + 1, tree.subtree_end(i) + 1) < 0: return None
+            score += 1
+        return score
+
+def compile_selector(criteria, id_match="exact"):
+    return criteria if isinstance(criteria, Selector) else Selector(criteria, id_match)
+
+# --- DIFF ---
+# Node state besides bounds that counts as a change (whichever the Portal sends)
+STATE_KEYS = ("checked", "selected", "focused", "enabled", "isChecked", "isSelected", "isFocused", "isEnabled")
+
+def node_keys(tree):
+    """Stable key per node: (className, resourceId, text or contentDescription, ordinal).
+
+    The ordinal counts earlier nodes with the same triple, so repeated rows
+    (e.g. identical list items) stay distinguishable without using indices,
+    which shift whenever anything above them appears or disappears.
+    """
+    seen = {}
+    keys = []
+    for i in range(len(tree)):
+        base = (tree.cls[i], tree.rid[i], tree.text[i] or tree.desc[i])
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        keys.append(base + (n,))
+    return keys
+
+def diff_trees(old, new):
+    """Compare two snapshots (UITree or flat node lists from traverse_tree_list).
+
+    Returns {"added": [new idx], "removed": [old idx], "changed": [(old idx, new idx)],
+    "unchanged": count}; a node is changed when it keeps its key but moved,
+    resized or flipped one of STATE_KEYS.
+    """
+    if not isinstance(old, UITree): old = UITree(old)
+    if not isinstance(new, UITree): new = UITree(new)
+    old_pos = {k: i for i, k in enumerate(node_keys(old))}
+
+    added, changed, unchanged = [], [], 0
+    for j, key in enumerate(node_keys(new)):
+        i = old_pos.pop(key, None)
+        if i is None:
+            added.append(j)
+            continue
+        a, b = old.node(i), new.node(j)
+        if (old.has_bounds[i] != new.has_bounds[j] or old.bounds[4 * i:4 * i + 4] != new.bounds[4 * j:4 * j + 4]
+                or any(a.get(k) != b.get(k) for k in STATE_KEYS)):
+            changed.append((i, j))
+        else:
+            unchanged += 1
+    return {"added": added, "removed": sorted(old_pos.values()), "changed": changed, "unchanged": unchanged}
+
+def screen_fingerprint(tree):
+    """Short hash of a screen's structure and layout: equal values mean the same screen."""
+    if tree._fingerprint is None:
+        h = hashlib.md5()
+        for i in range(len(tree)):
+            h.update(repr((tree.cls[i], tree.rid[i], tree.text[i] or tree.desc[i])).encode())
+        h.update(tree.bounds.tobytes())
+        tree._fingerprint = h.hexdigest()[:12]
+    return tree._fingerprint
+
+def diff_is_empty(diff):
+    return not (diff["added"] or diff["removed"] or diff["changed"])
@@ -1,89 +1,89 @@
+import argparse
+import base64
+import glob
+import hashlib
 import json
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import wifi_plan
 
-TEMPLATE_HEADER = '''import requests
-import json
+TEMPLATE_HEADER = '''import json
 import base64
 import time
 import re
 import wifi_config
+from droidrun_trace import StepTimer
+from droidrun_transport import get_transport, ActionQueue
+from screen_coords import scale_point
+from ui_tree import screen_fingerprint
+from wifi_wait import WaitEngine
 
 class DroidRunBot:
-    def __init__(self):
-        self.ip = wifi_config.TARGET_IP
-        self.port = wifi_config.TARGET_PORT
-        self.api_key = wifi_config.API_KEY
-        self.base_url = f"http://{self.ip}:{self.port}"
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}",
-        }
+    def __init__(self, ip=None, port=None, api_key=None):
+        self.ip = ip or wifi_config.TARGET_IP
+        self.port = port or wifi_config.TARGET_PORT
+        self.api_key = api_key or wifi_config.API_KEY
+        self.transport = get_transport(self.ip, self.port, self.api_key)
+        self.base_url = self.transport.base_url
+        self.waits = WaitEngine(self.transport)
+        self.tree = None # shared by taps recorded on the same screen
+        self.found = {} # their nodes, resolved together on that tree (step -> node)
+        self.steps = StepTimer(self.base_url) # per-step timing when DROIDRUN_TRACE is set
         print(f"🤖 Bot Started on {self.base_url}")
 
     def _post(self, endpoint, payload):
         try:
-            url = f"{self.base_url}{endpoint}"
-            requests.post(url, json=payload, headers=self.headers, timeout=5)
+            self.transport.post(endpoint, payload, timeout=5)
         except Exception as e: print(f"❌ Connection Error: {e}")
 
+    def _run_batch(self, steps):
+        # steps: [(endpoint, payload, delay_after)], endpoint None = plain pause
+        queue = ActionQueue(self.transport)
+        for endpoint, payload, delay in steps:
+            if endpoint is None: queue.sleep(delay)
+            else: queue.add(endpoint, payload, delay)
+        results = queue.flush()
+        failed = [r for r in results if r["status"] == "error"]
+        print(f"📦 ส่งคำสั่งชุด {len(results)} รายการ" + (f" (ผิดพลาด {len(failed)})" if failed else ""))
+        for r in failed: print(f"❌ Connection Error: {r['endpoint']} {r['message']}")
+
     def get_state_json(self):
         try:
-            # Use FAST endpoint by default
-            resp = requests.get(f"{self.base_url}/a11y_tree", headers=self.headers, timeout=5)
-            if resp.status_code == 200: 
-                data = resp.json()
-                root = data.get("result") or data
-                # Handle stringified JSON from new APK
-                if isinstance(root, str):
-                    try: return json.loads(root)
-                    except: pass
-                return root
+            # Use FAST endpoint by default (cached until the next action)
+            return self.transport.get_snapshot("/a11y_tree")
         except: pass
         return None
 
     def find_node(self, criteria):
-        # Result from a11y_tree is already the root node (dict) or list
-        root = self.get_state_json()
-        if not root: return None
-        
-        # Flatten tree
-        nodes = []
-        def traverse(n):
-            if isinstance(n, list): 
-                for i in n: traverse(i)
-            elif isinstance(n, dict):
-                nodes.append(n)
-                traverse(n.get("children") or n.get("subnodes"))
-        
-        # Determine if root is list or dict
-        if isinstance(root, list): traverse(root)
-        else: traverse(root)
+        try:
+            # Indexed lookup on the cached tree, or an early-stop scan of a fresh one
+            return self.transport.find_node(criteria)
+        except: return None
 
-        # Search Logic
-        best_node = None
-        best_score = 0
-        
-        t_text = criteria.get("text")
-        t_desc = criteria.get("contentDescription")
-        t_id = criteria.get("resourceId")
-        
-        for node in nodes:
-            score = 0
-            n_text = node.get("text")
-            n_desc = node.get("contentDescription")
-            n_id = node.get("resourceId")
-
-            if t_text and n_text == t_text: score += 3
-            if t_desc and n_desc == t_desc: score += 3
-            if t_id and n_id == t_id: score += 2
-            if t_text and n_text and t_text in n_text: score += 1
-            
-            if score > best_score:
-                best_score = score
-                best_node = node
-        
-        return best_node if best_score >= 2 else None
+    def find_nodes(self, selectors, tree=None):
+        # Several criteria in one pass over one snapshot: {key: best node or None}, same match as find_node()
+        try:
+            tree = tree or self.transport.get_tree()
+            found = tree.find_many(selectors, limit=1) if tree is not None else {}
+        except: found = {}
+        return {k: found[k][0].node if found.get(k) else None for k in selectors}
+
+    def cached_center(self, view, center, tree=None):
+        # Fast path: still on the screen the tap was recorded on -> recorded point, no search
+        try:
+            tree = tree or self.transport.get_tree()
+            if tree is not None and screen_fingerprint(tree) == view: return center
+        except: pass
+        return None, None
+
+    def scaled(self, payload, recorded):
+        # Swipe recorded at `recorded` (w, h) -> this device's pixels
+        size = self.transport.display_size()
+        for kx, ky in (("startX", "startY"), ("endX", "endY")):
+            payload[kx], payload[ky] = scale_point(payload[kx], payload[ky], recorded, size)
+        return payload
 
     def get_center(self, node):
         b = node.get("boundsInScreen")
@@ -103,6 +103,7 @@ class DroidRunBot:
 '''
 
 TEMPLATE_FOOTER = '''
+        self.steps.end()
         print("✅ จบการทำงาน (Script Finished)!")
 
 if __name__ == "__main__":
@@ -110,20 +111,110 @@ if __name__ == "__main__":
     bot.run()
 '''
 
-def compile_log():
-    log_file = "action_wifi_log.txt"
-    if not os.path.exists(log_file):
-        print(f"❌ ไม่พบไฟล์ Log: '{log_file}'")
-        return
+# Upper bound for a node to appear when compiling with waits=True
+WAIT_NODE_TIMEOUT = 10.0
 
-    print("🔨 --- DroidRun Compiler (TH) ---")
-    output_name = input("📄 ตั้งชื่อไฟล์ผลลัพธ์ (เช่น my_bot.py): ").strip()
-    if not output_name.endswith(".py"): output_name += ".py"
+# batch=True: steps that never look at the screen, grouped into one ActionQueue
+BATCHABLE_ACTIONS = {"home", "back", "key", "input", "clear", "swipe", "long_press", "sleep"}
+# Gap between keyboard steps inside a batch (they don't need a screen settle)
+BATCH_KEY_GAP = 0.1
 
-    with open(log_file, "r", encoding="utf-8") as f:
-        lines = f.readlines()
+def _payload_code(payload, data):
+    """Source for a swipe payload; rescaled at run time when the log has its resolution."""
+    if data.get("resolution") and "startX" in payload:
+        return f"self.scaled({payload!r}, {tuple(data['resolution'])!r})"
+    return repr(payload)
 
+def _batch_entry(action, data):
+    """(endpoint, payload, gap inside a batch, settle when last) for a batchable step."""
+    if action == "home": return "/action/global", {"action": 2}, 1.0, 1.0
+    if action == "back": return "/action/global", {"action": 1}, 1.0, 1.0
+    if action == "sleep": return None, None, data.get("duration", 1.0), 0
+    if action == "clear": return "/keyboard/clear", {}, BATCH_KEY_GAP, 0.5
+    if action == "key": return "/keyboard/key", {"key_code": int(data.get("key_code"))}, BATCH_KEY_GAP, 0.5
+    if action == "input":
+        encoded = base64.b64encode(data.get("text", "").encode()).decode()
+        return "/keyboard/input", {"base64_text": encoded}, BATCH_KEY_GAP, 1.0
+    if action == "long_press":
+        x, y = data.get("x"), data.get("y")
+        payload = {"startX": x, "startY": y, "endX": x, "endY": y, "duration": data.get("duration", 1000)}
+        return "/action/swipe", payload, 1.0, 1.0
+    if action == "swipe":
+        payload = {"startX": data.get("startX"), "startY": data.get("startY"),
+                   "endX": data.get("endX"), "endY": data.get("endY"), "duration": data.get("duration", 500)}
+        return "/action/swipe", payload, 1.0, 1.0
+
+def _hoisted_taps(lines, start):
+    """{step number: criteria} of the reuse_tree taps right after a fetch_tree at lines[start]."""
+    taps = {}
+    for j in range(start + 1, len(lines)):
+        line = lines[j].strip()
+        if not line: continue
+        try: data = json.loads(line)
+        except ValueError: break
+        if data.get("action") != "tap" or not data.get("reuse_tree"): break
+        taps[j + 1] = data.get("criteria", {})
+    return taps
+
+def optimize_lines(lines):
+    """Log lines -> (optimized log lines, plan with the per-pass report, parse errors)."""
+    plan, errors = wifi_plan.build_plan(lines)
+    plan = wifi_plan.optimize(plan)
+    return [json.dumps(wifi_plan.action_from_step(s), ensure_ascii=False) for s in plan["steps"]], plan, errors
+
+def compile_source(lines, waits=False, batch=False, optimize=False):
+    """build_script() with the wifi_plan optimization passes applied first when optimize=True.
+
+    Returns (script_source, errors, optimized plan or None).
+    """
+    if not optimize: return build_script(lines, waits=waits, batch=batch) + (None,)
+    lines, plan, errors = optimize_lines(lines)
+    source, more = build_script(lines, waits=waits, batch=batch)
+    return source, errors + more, plan
+
+def build_script(lines, waits=False, batch=False):
+    """Translate action log lines into a standalone bot script.
+
+    With waits=True the fixed settle sleeps after each step become
+    wait_for_idle() calls (capped at the old sleep) and taps wait for their
+    node to appear instead of sleeping first.
+
+    With batch=True runs of consecutive steps that don't depend on the UI
+    (home/back/key/input/clear/swipe/long_press/sleep) are sent as a single
+    ActionQueue; keyboard steps inside a run are spaced by BATCH_KEY_GAP.
+
+    Returns (script_source, errors) where errors is a list of (line_index, message).
+    """
     code_body = ""
+    errors = []
+
+    def settle(sec):
+        if waits: return f'        self.waits.wait_for_idle(timeout={sec})\n'
+        return f'        time.sleep({sec})\n'
+
+    pending = [] # (step_no, action, endpoint, payload, gap, settle)
+    hoisted = False # inside a fetch_tree group: self.tree / self.found are live
+
+    def flush_batch():
+        if not pending: return ""
+        first, last = pending[0][0], pending[-1][0]
+        names = ", ".join(p[1] for p in pending)
+        if not any(p[2] for p in pending):
+            # Only pauses: nothing to send, so no batch
+            total = round(sum(p[4] for p in pending), 3)
+            pending.clear()
+            label = f"Step {first}" if first == last else f"Steps {first}-{last}"
+            return (f"\n        # {label}: {names}\n        self.steps.mark({first}, 'sleep')\n"
+                    f'        print(f"😴 รอ {total} วินาที")\n        time.sleep({total})\n')
+        code = f"\n        # Steps {first}-{last}: batch ({names})\n        self.steps.mark({first}, 'batch')\n        self._run_batch([\n"
+        for n, (_, action, endpoint, payload, gap, last_settle) in enumerate(pending):
+            is_last = n == len(pending) - 1
+            delay = gap if not is_last else (0 if waits and endpoint else (last_settle or gap))
+            code += f"            ({endpoint!r}, {payload}, {delay}),\n"
+        code += "        ])\n"
+        if waits and pending[-1][2]: code += settle(pending[-1][5])
+        pending.clear()
+        return code
     
     for i, line in enumerate(lines):
         line = line.strip()
@@ -132,16 +223,32 @@ def compile_log():
         try:
             data = json.loads(line)
             action = data.get("action")
+            step_no = data.get("line", i + 1) # the original log line when optimized
+
+            if hoisted and not (action == "tap" and data.get("reuse_tree")):
+                # The hoisted tree only holds for its own taps
+                code_body += '        self.tree, self.found = None, {}\n'
+                hoisted = False
+
+            if batch and action in BATCHABLE_ACTIONS:
+                endpoint, payload, gap, last_settle = _batch_entry(action, data)
+                # A settle stretched by an optimization pass keeps its extra time inside the batch
+                extra = max(0, data.get("settle", last_settle) - last_settle) if endpoint else 0
+                if endpoint: payload = _payload_code(payload, data)
+                pending.append((step_no, action, endpoint, payload, gap + extra, last_settle + extra))
+                continue
+            code_body += flush_batch()
             
-            code_body += f"\n        # Step {i+1}: {action}\n"
+            code_body += f"\n        # Step {step_no}: {action}\n"
+            code_body += f"        self.steps.mark({step_no}, {action!r})\n"
             
             if action == "home":
                 code_body += '        self._post("/action/global", {"action": 2})\n'
-                code_body += '        time.sleep(1.0)\n'
+                code_body += settle(data.get("settle", 1.0))
                 
             elif action == "back":
                 code_body += '        self._post("/action/global", {"action": 1})\n'
-                code_body += '        time.sleep(1.0)\n'
+                code_body += settle(data.get("settle", 1.0))
                 
             elif action == "sleep":
                 dur = data.get("duration", 1.0)
@@ -151,58 +258,232 @@ def compile_log():
             elif action == "clear":
                 code_body += '        self._post("/keyboard/clear", {})\n'
                 code_body += '        print("🧹 ลบข้อความ")\n'
-                code_body += '        time.sleep(0.5)\n'
+                code_body += settle(data.get("settle", 0.5))
 
             elif action == "key":
                 k = data.get("key_code")
                 code_body += f'        self._post("/keyboard/key", {{"key_code": {k}}})\n'
                 code_body += f'        print("🎹 กดปุ่ม Code: {k}")\n'
-                code_body += '        time.sleep(0.5)\n'
+                code_body += settle(data.get("settle", 0.5))
 
             elif action == "long_press":
                   x, y = data.get("x"), data.get("y")
                   dur = data.get("duration", 1000)
-                  code_body += f'        self._post("/action/swipe", {{"startX": {x}, "startY": {y}, "endX": {x}, "endY": {y}, "duration": {dur}}})\n'
+                  payload = {"startX": x, "startY": y, "endX": x, "endY": y, "duration": dur}
+                  code_body += f'        self._post("/action/swipe", {_payload_code(payload, data)})\n'
                   code_body += f'        print("👆 กดค้างที่ ({x},{y}) นาน {dur}ms")\n'
-                  code_body += '        time.sleep(1.0)\n'
+                  code_body += settle(data.get("settle", 1.0))
 
             elif action == "swipe":
                   sx, sy = data.get("startX"), data.get("startY")
                   ex, ey = data.get("endX"), data.get("endY")
                   dur = data.get("duration", 500)
                   direction = data.get("direction")
-                  code_body += f'        self._post("/action/swipe", {{"startX": {sx}, "startY": {sy}, "endX": {ex}, "endY": {ey}, "duration": {dur}}})\n'
+                  payload = {"startX": sx, "startY": sy, "endX": ex, "endY": ey, "duration": dur}
+                  code_body += f'        self._post("/action/swipe", {_payload_code(payload, data)})\n'
                   if direction:
                       dir_th = {"left": "ซ้าย", "right": "ขวา", "up": "ขึ้น", "down": "ลง"}.get(direction, direction)
                       code_body += f'        print("👉 ปัดหน้าจอไปทาง{dir_th} ({sx},{sy} -> {ex},{ey}) นาน {dur}ms")\n'
                   else:
                       code_body += f'        print("👉 ปัดหน้าจอจาก ({sx},{sy}) ไป ({ex},{ey}) นาน {dur}ms")\n'
-                  code_body += '        time.sleep(1.0)\n'
+                  code_body += settle(data.get("settle", 1.0))
 
             elif action == "input":
                 txt = data.get("text", "")
                 code_body += f'        encoded = base64.b64encode("{txt}".encode()).decode()\n'
                 code_body += '        self._post("/keyboard/input", {"base64_text": encoded})\n'
                 code_body += f'        print("✍️ พิมพ์: {txt}")\n'
-                code_body += '        time.sleep(1.0)\n'
+                code_body += settle(data.get("settle", 1.0))
 
             elif action == "tap":
                 criteria = data.get("criteria", {})
-                code_body += f'        criteria = {json.dumps(criteria)}\n'
-                code_body += '        node = self.find_node(criteria)\n'
-                code_body += '        if node:\n'
-                code_body += '            cx, cy = self.get_center(node)\n'
-                code_body += '            if cx:\n'
-                code_body += f'                print(f"🎯 กดที่: {{criteria.get(\'text\') or \'Element\'}} พิกัด ({{cx}},{{cy}})")\n'
-                code_body += '                self._post("/action/tap", {"x": int(cx), "y": int(cy)})\n'
-                code_body += '            else: print("⚠️ หาพิกัดไม่เจอ (Invalid Bounds)")\n'
+                code_body += f'        criteria = {criteria!r}\n'
+                if data.get("reuse_tree"):
+                    # Not on the hoisted tree (e.g. it appeared since): look again on a fresh one
+                    lookup = f'self.found.get({i+1}) or self.find_node(criteria)'
+                elif waits:
+                    lookup = f'self.waits.wait_for_node(criteria, timeout={WAIT_NODE_TIMEOUT})'
+                else:
+                    lookup = 'self.find_node(criteria)'
+                if data.get("view") and data.get("center"):
+                    tree_arg = ", self.tree" if data.get("reuse_tree") else ""
+                    code_body += '        node = None\n'
+                    code_body += f'        cx, cy = self.cached_center({data["view"]!r}, {tuple(data["center"])!r}{tree_arg})\n'
+                    code_body += '        if cx is None:\n'
+                    code_body += f'            node = {lookup}\n'
+                    code_body += '            if node: cx, cy = self.get_center(node)\n'
+                else:
+                    code_body += f'        node = {lookup}\n'
+                    code_body += '        cx, cy = self.get_center(node) if node else (None, None)\n'
+                code_body += '        if cx:\n'
+                code_body += f'            print(f"🎯 กดที่: {{criteria.get(\'text\') or \'Element\'}} พิกัด ({{cx}},{{cy}})")\n'
+                code_body += '            self._post("/action/tap", {"x": int(cx), "y": int(cy)})\n'
+                code_body += '        elif node: print("⚠️ หาพิกัดไม่เจอ (Invalid Bounds)")\n'
                 code_body += '        else: print(f"⚠️ หาปุ่มไม่เจอ: {criteria.get(\'text\')}")\n'
-                code_body += '        time.sleep(1.5)\n'
+                code_body += settle(data.get("settle", 1.5))
+
+            elif action == "fetch_tree":
+                hoisted = True
+                # Hoisted by the optimizer: one tree for the taps that follow
+                if waits:
+                    code_body += f'        self.waits.wait_for_node({data.get("criteria", {})!r}, timeout={WAIT_NODE_TIMEOUT})\n'
+                code_body += '        self.tree = self.transport.get_tree("/a11y_tree", fresh=True)\n'
+                code_body += f'        self.found = self.find_nodes({_hoisted_taps(lines, i)!r}, self.tree)\n'
+
+            elif action == "expect":
+                # Post-condition captured by the recorder's diff: a node that should now be on screen
+                criteria = data.get("criteria", {})
+                code_body += f'        criteria = {criteria!r}\n'
+                if waits:
+                    code_body += f'        node = self.waits.wait_for_node(criteria, timeout={WAIT_NODE_TIMEOUT})\n'
+                else:
+                    code_body += '        node = self.find_node(criteria)\n'
+                code_body += '        if not node: print(f"⚠️ ไม่พบหน้าจอที่คาดไว้: {criteria.get(\'text\') or criteria}")\n'
 
         except Exception as e:
-            print(f"⚠️ Error parsing line {i}: {e}")
+            errors.append((i, str(e)))
+
+    code_body += flush_batch()
+    return TEMPLATE_HEADER + code_body + TEMPLATE_FOOTER, errors
+
+# --- BATCH COMPILE ---
+MANIFEST_NAME = ".compile_manifest.json"
+
+def _compiler_digest():
+    # Output depends on this file too: editing the compiler recompiles everything
+    with open(__file__, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+def find_logs(pattern):
+    """A directory (its *.txt logs) or a glob pattern -> sorted list of log paths."""
+    if os.path.isdir(pattern): pattern = os.path.join(pattern, "*.txt")
+    return sorted(p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p))
+
+def _compile_job(job):
+    path, out_path, waits, batch, plan, optimize = job
+    t0 = time.perf_counter()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        if plan:
+            result, errors = wifi_plan.build_plan(lines, source=path)
+            wifi_plan.save_plan(wifi_plan.optimize(result), out_path)
+        else:
+            source, errors, _ = compile_source(lines, waits, batch, optimize)
+            with open(out_path, "w", encoding="utf-8") as f:
+                f.write(source)
+        status = "compiled"
+    except Exception as e:
+        errors, status = [(None, f"{type(e).__name__}: {e}")], "failed"
+    return {"path": path, "out": out_path, "status": status, "errors": errors,
+            "elapsed": round(time.perf_counter() - t0, 4)}
+
+def compile_many(pattern, out_dir=None, jobs=None, waits=False, batch=False, plan=False, force=False,
+                 optimize=False):
+    """Compile every log matched by `pattern` across a process pool, without prompting.
+
+    Outputs go to out_dir (default: next to each log) as <name>.py or
+    <name>.plan.json. Logs whose content and options are unchanged since the
+    last run (see MANIFEST_NAME in the output directory) are skipped.
+    Returns one result dict per log.
+    """
+    paths = find_logs(pattern)
+    if not paths: return []
+    manifest_path = os.path.join(out_dir or ".", MANIFEST_NAME)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if out_dir: os.makedirs(out_dir, exist_ok=True)
+
+    options = f"{_compiler_digest()}:{int(waits)}{int(batch)}{int(plan)}{int(optimize)}"
+    ext = ".plan.json" if plan else ".py"
+    results, jobs_todo, digests, seen = [], [], {}, set()
+    for path in paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        out_path = os.path.join(out_dir or os.path.dirname(path), stem + ext)
+        key = os.path.abspath(out_path)
+        if out_path in seen:
+            results.append({"path": path, "out": out_path, "status": "failed", "elapsed": 0,
+                            "errors": [(None, "output name clashes with another log")]})
+            continue
+        seen.add(out_path)
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read() + options.encode()).hexdigest()
+        entry = manifest.get(key)
+        if not force and entry and entry.get("hash") == digest and os.path.exists(out_path):
+            results.append({"path": path, "out": out_path, "status": "skipped", "elapsed": 0,
+                            "errors": entry.get("errors", [])})
+            continue
+        digests[path] = (key, digest)
+        jobs_todo.append((path, out_path, waits, batch, plan, optimize))
+
+    if len(jobs_todo) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            done = list(pool.map(_compile_job, jobs_todo, chunksize=max(1, len(jobs_todo) // 32)))
+    else:
+        done = [_compile_job(job) for job in jobs_todo]
+
+    for res in done:
+        key, digest = digests[res["path"]]
+        if res["status"] == "compiled":
+            manifest[key] = {"hash": digest, "source": res["path"], "errors": res["errors"]}
+        else:
+            manifest.pop(key, None)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, ensure_ascii=False)
 
-    full_script = TEMPLATE_HEADER + code_body + TEMPLATE_FOOTER
+    results.extend(done)
+    results.sort(key=lambda r: r["path"])
+    return results
+
+def print_compile_summary(results):
+    counts = {s: sum(1 for r in results if r["status"] == s) for s in ("compiled", "skipped", "failed")}
+    with_errors = [r for r in results if r["errors"]]
+    print(f"\n📦 {len(results)} logs: {counts['compiled']} compiled, {counts['skipped']} unchanged, "
+          f"{counts['failed']} failed, {len(with_errors)} with bad lines")
+    for r in with_errors:
+        mark = "❌" if r["status"] == "failed" else "⚠️"
+        print(f"{mark} {r['path']} ({len(r['errors'])} errors)")
+        for i, err in r["errors"][:5]:
+            print(f"     line {i}: {err}" if i is not None else f"     {err}")
+        if len(r["errors"]) > 5: print(f"     ... {len(r['errors']) - 5} more")
+
+def compile_plan(lines, output_name, source=None):
+    """Write an optimized JSON plan (run with wifi_plan.py) instead of Python code."""
+    plan, errors = wifi_plan.build_plan(lines, source=source)
+    for i, err in errors:
+        print(f"⚠️ Error parsing line {i}: {err}")
+    plan = wifi_plan.optimize(plan)
+    wifi_plan.save_plan(plan, output_name)
+    wifi_plan.print_savings(plan)
+    print(f"\n✨ สร้าง Plan สำเร็จ! ({len(plan['steps'])} steps) บันทึกที่: {output_name}")
+    print(f"👉 สั่งรันได้เลย: python wifi_plan.py {output_name}")
+
+def compile_log(waits=False, batch=False, plan=False, optimize=False):
+    log_file = "action_wifi_log.txt"
+    if not os.path.exists(log_file):
+        print(f"❌ ไม่พบไฟล์ Log: '{log_file}'")
+        return
+
+    print("🔨 --- DroidRun Compiler (TH) ---")
+    if plan:
+        output_name = input("📄 ตั้งชื่อไฟล์ผลลัพธ์ (เช่น my_flow.plan.json): ").strip()
+        if not output_name.endswith(".json"): output_name += ".plan.json"
+    else:
+        output_name = input("📄 ตั้งชื่อไฟล์ผลลัพธ์ (เช่น my_bot.py): ").strip()
+        if not output_name.endswith(".py"): output_name += ".py"
+
+    with open(log_file, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+
+    if plan: return compile_plan(lines, output_name, source=log_file)
+
+    full_script, errors, optimized = compile_source(lines, waits, batch, optimize)
+    for i, err in errors:
+        print(f"⚠️ Error parsing line {i}: {err}")
+    if optimized: wifi_plan.print_savings(optimized)
     
     with open(output_name, "w", encoding="utf-8") as f:
         f.write(full_script)
@@ -210,5 +491,31 @@ def compile_log():
     print(f"\n✨ สร้างไฟล์สำเร็จ! บันทึกที่: {output_name}")
     print(f"👉 สั่งรันได้เลย: python {output_name}")
 
+def main():
+    parser = argparse.ArgumentParser(description="Compile action logs into bot scripts")
+    parser.add_argument("--wait", action="store_true", help="condition-based waits instead of fixed sleeps")
+    parser.add_argument("--batch", action="store_true", help="send runs of non-UI steps as one action batch")
+    parser.add_argument("--plan", action="store_true", help="emit a JSON plan for wifi_plan.py instead of Python")
+    parser.add_argument("-O", "--optimize", action="store_true",
+                        help="run the plan optimization passes before generating Python (always on for --plan)")
+    parser.add_argument("--logs", help="compile every log in this directory / glob, without prompting")
+    parser.add_argument("--out", help="output directory for --logs (default: next to each log)")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes for --logs (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="recompile unchanged logs too")
+    args = parser.parse_args()
+
+    if not args.logs:
+        return compile_log(waits=args.wait, batch=args.batch, plan=args.plan, optimize=args.optimize)
+
+    t0 = time.perf_counter()
+    results = compile_many(args.logs, args.out, args.jobs, args.wait, args.batch, args.plan, args.force,
+                           args.optimize)
+    if not results:
+        print(f"❌ ไม่พบไฟล์ Log: '{args.logs}'")
+        sys.exit(1)
+    print_compile_summary(results)
+    print(f"⏱ {time.perf_counter() - t0:.2f}s")
+    sys.exit(1 if any(r["status"] == "failed" for r in results) else 0)
+
 if __name__ == "__main__":
-    compile_log()
+    main()
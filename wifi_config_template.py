@@ -4,4 +4,11 @@ TARGET_IP = "192.168.1.xxx" # เปลี่ยนเป็น IP ของม
 TARGET_PORT = 8080           # Port ห้ามเปลี่ยนถ้าไม่ได้ตั้งค่าใหม่
 
 API_KEY = "dr_sk_xxxxx"      # API Key จากแอป (ตัวอย่าง: dr_sk_... ยาว 70 ตัวอักษร)
+
+# (ไม่บังคับ) อายุสูงสุดของหน้าจอที่ Cache ไว้ (วินาที), None = ใช้จนกว่าจะมีการสั่ง Action
+SNAPSHOT_MAX_AGE = None
+
+# (ไม่บังคับ) ไฟล์รายชื่อมือถือ (รูปแบบเดียวกับ devices.json ของ wifi_fleet.py)
+# ให้ MCP Server คุมหลายเครื่องพร้อมกัน: ทุก Tool รับ device_id = "name" ของเครื่อง
+DEVICES_FILE = None
 # ---------------------------------
@@ -0,0 +1,166 @@
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import wifi_plan
+import wifi_replay
+
+# --- INVENTORY ---
+# devices.json: [{"name": "phone-01", "ip": "192.168.1.10", "port": 8080, "api_key": "dr_sk_..."}, ...]
+# (or {"devices": [...]}; see devices_template.json)
+
+def load_inventory(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict): data = data.get("devices", [])
+
+    devices = []
+    for i, d in enumerate(data):
+        if not d.get("ip") or not d.get("api_key"):
+            raise ValueError(f"device #{i} needs 'ip' and 'api_key'")
+        devices.append({
+            "name": d.get("name") or f"{d['ip']}:{d.get('port', 8080)}",
+            "ip": d["ip"],
+            "port": int(d.get("port", 8080)),
+            "api_key": d["api_key"],
+        })
+    return devices
+
+# --- FLOW LOADING ---
+def load_bot_class(flow_path):
+    """Return a bot factory (ip, port, api_key) -> .run() for a .py script, a .json plan or a raw log."""
+    if flow_path.endswith(".json"):
+        plan = wifi_plan.load_plan(flow_path)
+        return lambda ip, port, api_key: wifi_plan.PlanBot(plan, ip, port, api_key)
+
+    if flow_path.endswith(".py"):
+        spec = importlib.util.spec_from_file_location("fleet_flow", flow_path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module.DroidRunBot
+
+    # Raw recording: replayed line by line, no code generation
+    return lambda ip, port, api_key: wifi_replay.ReplayBot(flow_path, ip, port, api_key)
+
+# --- OUTPUT ---
+class _DeviceStdout:
+    """Prefix every line printed from a worker thread with its device name."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        prefix = getattr(self.local, "prefix", None)
+        if prefix is None: return self.stream.write(text)
+        buf = getattr(self.local, "buf", "") + text
+        *lines, self.local.buf = buf.split("\n")
+        with self.lock:
+            for line in lines: self.stream.write(f"[{prefix}] {line}\n")
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+# --- RUNNER ---
+def run_device(bot_class, device):
+    result = {"name": device["name"], "ip": device["ip"], "port": device["port"]}
+    t0 = time.perf_counter()
+    try:
+        bot = bot_class(device["ip"], device["port"], device["api_key"])
+        bot.run()
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    result["elapsed"] = round(time.perf_counter() - t0, 3)
+    return result
+
+def run_fleet(bot_class, devices, workers=8, out=None):
+    out = out or sys.stdout
+    results = []
+    t0 = time.perf_counter()
+
+    def job(device):
+        if isinstance(sys.stdout, _DeviceStdout): sys.stdout.local.prefix = device["name"]
+        try: return run_device(bot_class, device)
+        finally:
+            if isinstance(sys.stdout, _DeviceStdout): sys.stdout.local.prefix = None
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(job, d) for d in devices]
+        for fut in as_completed(futures):
+            res = fut.result()
+            results.append(res)
+            mark = "✅" if res["status"] == "ok" else "❌"
+            print(f"{mark} {res['name']} ({res['elapsed']:.2f}s) {res.get('error', '')}", file=out)
+
+    wall = time.perf_counter() - t0
+    times = [r["elapsed"] for r in results]
+    summary = {
+        "devices": len(results),
+        "ok": sum(1 for r in results if r["status"] == "ok"),
+        "failed": sum(1 for r in results if r["status"] != "ok"),
+        "workers": workers,
+        "wall_time": round(wall, 3),
+        "device_time_total": round(sum(times), 3),
+        "device_time_min": min(times) if times else 0,
+        "device_time_max": max(times) if times else 0,
+        "device_time_mean": round(sum(times) / len(times), 3) if times else 0,
+    }
+    order = {d["name"]: i for i, d in enumerate(devices)}
+    results.sort(key=lambda r: order.get(r["name"], 0))
+    return {"summary": summary, "results": results}
+
+def print_report(report):
+    s = report["summary"]
+    print("\n📊 --- Fleet Report ---")
+    print("-" * 65)
+    print(f"{'DEVICE':<20} | {'STATUS':<6} | {'TIME':>8} | ERROR")
+    print("-" * 65)
+    for r in report["results"]:
+        print(f"{r['name']:<20} | {r['status']:<6} | {r['elapsed']:>7.2f}s | {r.get('error', '')}")
+    print("-" * 65)
+    print(f"✅ {s['ok']}/{s['devices']} OK  |  ⏱ wall {s['wall_time']:.2f}s  |  "
+          f"per-device min/mean/max {s['device_time_min']:.2f}/{s['device_time_mean']:.2f}/{s['device_time_max']:.2f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one DroidRun flow on many phones in parallel")
+    parser.add_argument("inventory", help="devices.json (list of {name, ip, port, api_key})")
+    parser.add_argument("flow", help="compiled bot .py, plan .json or recorded action_wifi_log.txt")
+    parser.add_argument("-w", "--workers", type=int, default=8, help="max phones running at once (default 8)")
+    parser.add_argument("--json", dest="json_out", help="write per-device results + summary to this file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.flow):
+        print(f"❌ ไม่พบไฟล์: '{args.flow}'")
+        sys.exit(1)
+
+    devices = load_inventory(args.inventory)
+    bot_class = load_bot_class(args.flow)
+    print(f"🚀 Running '{args.flow}' on {len(devices)} devices ({args.workers} workers)")
+
+    real_stdout = sys.stdout
+    sys.stdout = _DeviceStdout(real_stdout)
+    try:
+        report = run_fleet(bot_class, devices, args.workers, out=real_stdout)
+    finally:
+        sys.stdout = real_stdout
+
+    print_report(report)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Saved results to '{args.json_out}'")
+    sys.exit(0 if report["summary"]["failed"] == 0 else 1)
+
+if __name__ == "__main__":
+    main()
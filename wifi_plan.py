@@ -0,0 +1,337 @@
+import base64
+import json
+import sys
+import time
+
+import droidrun_trace
+from droidrun_transport import get_transport
+from screen_coords import scale_point
+from ui_tree import parse_bounds, screen_fingerprint
+from wifi_wait import WaitEngine
+
+# --- PLAN FORMAT ---
+# {"version": 1, "steps": [{"op": "home", "settle": 1.0}, {"op": "tap", "criteria": {...}, "settle": 1.5}, ...]}
+# One step per log line, same vocabulary as action_wifi_log.txt. "settle" is the
+# pause after the step (the same fixed sleeps wifi_compiler emits). Optimization
+# passes may add "fetch_tree" steps and "reuse_tree" on taps. Taps recorded with
+# "view" + "center" hit the recorded point directly when the screen fingerprint
+# still matches; "resolution" scales recorded coordinates to the current device.
+# "line" is the step's line in the source log, kept through the optimization
+# passes so step numbers in traces point back at the log.
+PLAN_VERSION = 1
+
+SETTLE = {"home": 1.0, "back": 1.0, "clear": 0.5, "key": 0.5, "long_press": 1.0,
+          "swipe": 1.0, "input": 1.0, "tap": 1.5, "sleep": 0, "expect": 0, "fetch_tree": 0}
+
+# Keys copied from a log entry into its plan step
+STEP_FIELDS = {
+    "home": (), "back": (), "clear": (),
+    "sleep": ("duration",),
+    "key": ("key_code",),
+    "input": ("text",),
+    "tap": ("criteria", "view", "reuse_tree", "center", "resolution"),
+    "expect": ("criteria",),
+    "fetch_tree": ("criteria",),
+    "long_press": ("x", "y", "duration", "resolution"),
+    "swipe": ("startX", "startY", "endX", "endY", "duration", "direction", "resolution"),
+}
+DEFAULTS = {"sleep": {"duration": 1.0}, "long_press": {"duration": 1000}, "swipe": {"duration": 500},
+            "input": {"text": ""}, "tap": {"criteria": {}}, "expect": {"criteria": {}}}
+
+def step_from_action(data):
+    action = data.get("action")
+    if action not in STEP_FIELDS: raise ValueError(f"unknown action '{action}'")
+    step = {"op": action}
+    defaults = DEFAULTS.get(action, {})
+    for key in STEP_FIELDS[action]:
+        value = data.get(key, defaults.get(key))
+        if value is not None: step[key] = value
+    if action == "key": step["key_code"] = int(step["key_code"])
+    if SETTLE[action] or "settle" in data: step["settle"] = data.get("settle", SETTLE[action])
+    return step
+
+def action_from_step(step):
+    """Plan step -> log entry (inverse of step_from_action; keeps settle/reuse_tree)."""
+    data = {"action": step["op"]}
+    data.update((k, v) for k, v in step.items() if k != "op")
+    return data
+
+def build_plan(lines, source=None):
+    """Action log lines -> (plan, errors); errors is a list of (line_index, message)."""
+    steps, errors = [], []
+    for i, line in enumerate(lines):
+        line = line.strip()
+        if not line: continue
+        try:
+            step = step_from_action(json.loads(line))
+            step["line"] = i + 1
+            steps.append(step)
+        except Exception as e:
+            errors.append((i, str(e)))
+    plan = {"version": PLAN_VERSION, "steps": steps}
+    if source: plan["source"] = source
+    return plan, errors
+
+def save_plan(plan, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, ensure_ascii=False, separators=(",", ":"))
+
+def load_plan(path):
+    with open(path, "r", encoding="utf-8") as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"unsupported plan version {plan.get('version')}")
+    return plan
+
+# --- OPTIMIZATION PASSES ---
+# Each pass takes a step list and returns a new one; the plan itself is not mutated.
+def merge_sleeps(steps):
+    """Adjacent sleep steps become one."""
+    out = []
+    for step in steps:
+        if step["op"] == "sleep" and out and out[-1]["op"] == "sleep":
+            out[-1] = dict(out[-1], duration=out[-1]["duration"] + step["duration"])
+        else:
+            out.append(step)
+    return out
+
+def drop_noops(steps):
+    """Sleeps of zero (or negative) length do nothing."""
+    return [s for s in steps if not (s["op"] == "sleep" and s.get("duration", 0) <= 0)]
+
+# Screen-neutral steps that are safe to send once when repeated back to back
+# (a second HOME on the home screen or a second clear does nothing; BACK is not
+# one of them, every BACK navigates)
+IDEMPOTENT_OPS = {"home", "clear"}
+
+def dedupe_globals(steps):
+    """Drop an idempotent step that repeats the one right before it (keeping the longer settle)."""
+    out = []
+    for step in steps:
+        prev = out[-1] if out else None
+        if prev and step["op"] in IDEMPOTENT_OPS and prev["op"] == step["op"]:
+            out[-1] = dict(prev, settle=max(prev.get("settle", 0), step.get("settle", 0)))
+        else:
+            out.append(step)
+    return out
+
+def fold_sleeps(steps):
+    """A sleep right after an action becomes part of that action's settle.
+
+    Same total pause when run with fixed sleeps; with waits the whole settle is
+    a wait_for_idle cap, so the recorded sleep stops being paid in full.
+    """
+    out = []
+    for step in steps:
+        prev = out[-1] if out else None
+        if step["op"] == "sleep" and prev and prev["op"] not in ("sleep", "expect", "fetch_tree"):
+            out[-1] = dict(prev, settle=round(prev.get("settle", 0) + step["duration"], 3))
+        else:
+            out.append(step)
+    return out
+
+def hoist_tree_fetch(steps):
+    """Consecutive taps picked on the same screen share one tree fetch.
+
+    The recorder tags each tap with the fingerprint ("view") of the screen it
+    was resolved on; when consecutive taps carry the same one, the earlier
+    taps did not change the screen. Such a run gets one fetch_tree step in
+    front and its taps resolve against that tree instead of re-reading it.
+    """
+    out, i = [], 0
+    while i < len(steps):
+        step = steps[i]
+        j = i + 1
+        if step["op"] == "tap" and step.get("view") is not None:
+            while j < len(steps) and steps[j]["op"] == "tap" and steps[j].get("view") == step["view"]: j += 1
+        if j - i > 1:
+            out.append({"op": "fetch_tree", "criteria": step["criteria"]})
+            out.extend(dict(s, reuse_tree=True) for s in steps[i:j])
+        else:
+            out.extend(steps[i:j])
+        i = j
+    return out
+
+PASSES = {"merge_sleeps": merge_sleeps, "drop_noops": drop_noops, "dedupe_globals": dedupe_globals,
+          "fold_sleeps": fold_sleeps, "hoist_tree_fetch": hoist_tree_fetch}
+DEFAULT_PASSES = ("merge_sleeps", "drop_noops", "dedupe_globals", "fold_sleeps", "hoist_tree_fetch")
+
+# --- COST MODEL (seconds, rough Wi-Fi figures for estimates only) ---
+REQUEST_COST = 0.05     # one action POST
+TREE_FETCH_COST = 0.2   # GET /a11y_tree + decode
+IDLE_SETTLE = 0.3       # typical wait_for_idle when the screen settles quickly
+
+def estimate_time(steps, waits=False):
+    """Rough run time of a step list, with fixed sleeps or with condition waits."""
+    total = 0.0
+    for step in steps:
+        op = step["op"]
+        settle = step.get("settle", 0)
+        total += min(settle, IDLE_SETTLE) if waits else settle
+        if op == "sleep": total += step["duration"]
+        elif op == "fetch_tree" or op == "expect": total += TREE_FETCH_COST
+        elif op == "tap": total += REQUEST_COST + (0 if step.get("reuse_tree") else TREE_FETCH_COST)
+        else: total += REQUEST_COST
+    return total
+
+def optimize(plan, passes=DEFAULT_PASSES):
+    """Run the passes; the result records each pass's estimated time saved (fixed sleeps / waits)."""
+    steps = list(plan["steps"])
+    report = []
+    for name in passes:
+        before = (estimate_time(steps), estimate_time(steps, waits=True), len(steps))
+        steps = PASSES[name](steps)
+        report.append({"pass": name, "steps_removed": before[2] - len(steps),
+                       "saved_s": round(before[0] - estimate_time(steps), 3),
+                       "saved_wait_s": round(before[1] - estimate_time(steps, waits=True), 3)})
+    return dict(plan, steps=steps, passes=report)
+
+def print_savings(plan):
+    for r in plan.get("passes", []):
+        print(f"   🔧 {r['pass']:<17} {-r['steps_removed']:+d} steps, ~{r['saved_s']:.2f}s saved "
+              f"(~{r['saved_wait_s']:.2f}s with --wait)")
+
+# --- RUNTIME ---
+class PlanRunner:
+    """Shared interpreter for plans: executes steps over one pooled transport.
+
+    speed scales every fixed pause (sleep steps and settles): 2.0 runs them
+    twice as fast, 0 skips them.
+    """
+
+    def __init__(self, transport, waits=False, verbose=True, speed=1.0):
+        self.transport = transport
+        self.waits = WaitEngine(transport) if waits else None
+        self.verbose = verbose
+        self.speed = speed
+        self.tree = None # hoisted by fetch_tree steps
+
+    def log(self, msg):
+        if self.verbose: print(msg)
+
+    def _post(self, endpoint, payload):
+        resp = self.transport.post(endpoint, payload)
+        resp.raise_for_status()
+
+    def scaled(self, seconds):
+        return seconds / self.speed if self.speed > 0 else 0
+
+    def pause(self, seconds):
+        seconds = self.scaled(seconds)
+        if seconds > 0: time.sleep(seconds)
+
+    def settle(self, step):
+        sec = self.scaled(step.get("settle", 0))
+        if sec <= 0: return
+        if self.waits: self.waits.wait_for_idle(timeout=sec)
+        else: time.sleep(sec)
+
+    def find(self, criteria):
+        if self.waits: return self.waits.wait_for_node(criteria, timeout=10.0)
+        return self.transport.find_node(criteria)
+
+    def point(self, step, x, y):
+        """Recorded coordinates scaled to this device's resolution (no tree needed)."""
+        if "resolution" not in step: return x, y
+        return scale_point(x, y, step["resolution"], self.transport.display_size())
+
+    def cached_center(self, step):
+        """Recorded center of a tap when the current screen is the one it was recorded on."""
+        if "center" not in step or "view" not in step: return None
+        tree = self.tree if step.get("reuse_tree") and self.tree is not None else self.transport.get_tree()
+        if tree is None or screen_fingerprint(tree) != step["view"]: return None
+        return tuple(step["center"])
+
+    def find_center(self, criteria, reuse_tree=False):
+        node = self.tree.find_node(criteria) if reuse_tree and self.tree is not None else None
+        if not node: node = self.find(criteria) # not on the hoisted tree: look on a fresh one
+        if not node: return None
+        b = parse_bounds(node)
+        return ((b[0] + b[2]) // 2, (b[1] + b[3]) // 2) if b else None
+
+    def execute(self, step):
+        op = step["op"]
+        if op == "home": self._post("/action/global", {"action": 2})
+        elif op == "back": self._post("/action/global", {"action": 1})
+        elif op == "clear": self._post("/keyboard/clear", {})
+        elif op == "key": self._post("/keyboard/key", {"key_code": step["key_code"]})
+        elif op == "sleep":
+            self.log(f"😴 รอ {step['duration']} วินาที")
+            self.pause(step["duration"])
+        elif op == "input":
+            encoded = base64.b64encode(step["text"].encode()).decode()
+            self._post("/keyboard/input", {"base64_text": encoded})
+            self.log(f"✍️ พิมพ์: {step['text']}")
+        elif op == "long_press":
+            x, y = self.point(step, step["x"], step["y"])
+            self._post("/action/swipe", {"startX": x, "startY": y, "endX": x, "endY": y, "duration": step["duration"]})
+        elif op == "swipe":
+            sx, sy = self.point(step, step["startX"], step["startY"])
+            ex, ey = self.point(step, step["endX"], step["endY"])
+            self._post("/action/swipe", {"startX": sx, "startY": sy, "endX": ex, "endY": ey, "duration": step["duration"]})
+        elif op == "tap":
+            criteria = step["criteria"]
+            center = self.cached_center(step) or self.find_center(criteria, step.get("reuse_tree"))
+            if not center: raise LookupError(f"หาปุ่มไม่เจอ: {criteria.get('text') or criteria}")
+            self.log(f"🎯 กดที่: {criteria.get('text') or 'Element'} พิกัด {center}")
+            self._post("/action/tap", {"x": int(center[0]), "y": int(center[1])})
+        elif op == "fetch_tree":
+            if self.waits: self.waits.wait_for_node(step["criteria"], timeout=10.0)
+            self.tree = self.transport.get_tree("/a11y_tree", fresh=True)
+        elif op == "expect":
+            criteria = step["criteria"]
+            if not self.find(criteria): raise LookupError(f"ไม่พบหน้าจอที่คาดไว้: {criteria.get('text') or criteria}")
+        else:
+            raise ValueError(f"unknown op '{op}'")
+
+    def run(self, plan):
+        """Run every step; returns [{"step", "op", "ok", "elapsed", "error"?}]."""
+        return self.run_steps(plan["steps"])
+
+    def run_steps(self, steps):
+        """Same as run() for any iterable of steps (e.g. streamed from a log)."""
+        self.log("🎬 เริ่มทำงาน (Action Started)...")
+        results = []
+        for i, step in enumerate(steps):
+            t0 = time.perf_counter()
+            res = {"step": step.get("line", i + 1), "op": step["op"], "ok": True}
+            try:
+                self.execute(step)
+            except Exception as e:
+                res["ok"] = False
+                res["error"] = str(e)
+                self.log(f"⚠️ Step {res['step']} ({step['op']}): {e}")
+            self.settle(step)
+            res["elapsed"] = round(time.perf_counter() - t0, 4)
+            results.append(res)
+            if droidrun_trace.active:
+                event = {"kind": "step", "name": res["op"], "step": res["step"], "ok": res["ok"],
+                         "ms": round(res["elapsed"] * 1000, 3), "device": self.transport.base_url}
+                if "error" in res: event["error"] = res["error"]
+                droidrun_trace.active.emit(event)
+        self.log("✅ จบการทำงาน (Script Finished)!")
+        return results
+
+
+class PlanBot:
+    """DroidRunBot-compatible wrapper (ip, port, api_key) -> .run() for a loaded plan."""
+
+    def __init__(self, plan, ip=None, port=None, api_key=None, waits=False):
+        self.plan = plan
+        self.runner = PlanRunner(get_transport(ip, port, api_key), waits=waits)
+
+    def run(self):
+        return self.runner.run(self.plan)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python wifi_plan.py <flow.plan.json> [--wait]")
+        sys.exit(1)
+    plan = load_plan(sys.argv[1])
+    results = PlanBot(plan, waits="--wait" in sys.argv).run()
+    failed = [r for r in results if not r["ok"]]
+    print(f"⏱ {sum(r['elapsed'] for r in results):.2f}s, {len(results)} steps, {len(failed)} failed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
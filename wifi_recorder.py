@@ -1,4 +1,3 @@
-import requests
 import json
 import base64
 import os
@@ -6,19 +5,23 @@ import time
 import sys
 # Import Config
 import wifi_config
+from droidrun_transport import get_transport
+from screen_coords import REFERENCE_SIZE, swipe_points
+from ui_tree import UITree, decode_payload, diff_is_empty, diff_trees, parse_bounds, screen_fingerprint
 
 class DroidRunWirelessRecorder:
     def __init__(self):
         self.ip = wifi_config.TARGET_IP
         self.port = wifi_config.TARGET_PORT
         self.api_key = wifi_config.API_KEY
-        self.base_url = f"http://{self.ip}:{self.port}"
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}",
-        }
-        self.width = 1080 
-        self.height = 2400
+        self.transport = get_transport(self.ip, self.port, self.api_key)
+        self.base_url = self.transport.base_url
+        # Reuse the last dump for idx/long until an action invalidates it
+        self.transport.snapshots.max_age = getattr(wifi_config, "SNAPSHOT_MAX_AGE", None)
+        self.view_endpoint = "/state_full" # endpoint of the list the user last saw
+        self.last_tree = None # the list the user last saw, for diffs
+        self.actions_since_view = 0
+        self.width, self.height = REFERENCE_SIZE
         print(f"🔗 Connecting to {self.base_url} ...")
         self.init_screen_size()
         
@@ -33,11 +36,14 @@ class DroidRunWirelessRecorder:
         with open(self.log_file, "a", encoding='utf-8') as f:
             json.dump(action_data, f, ensure_ascii=False)
             f.write("\n")
+        if action_data["action"] != "expect": self.actions_since_view += 1
         print(f"  💾 Recorded: {action_data['action']}")
 
     def init_screen_size(self):
+        # Read once per device; logged with every coordinate so replays can rescale
+        self.width, self.height = self.transport.display_size() or REFERENCE_SIZE
         try:
-            resp = requests.get(f"{self.base_url}/phone_state", headers=self.headers, timeout=3)
+            resp = self.transport.get("/phone_state", timeout=3)
             if resp.status_code == 200:
                 data = resp.json()
                 # Handle nested result string
@@ -47,8 +53,6 @@ class DroidRunWirelessRecorder:
                         data.update(inner) # Merge inner dict
                     except: pass
 
-                self.width = data.get("displayWidth", 1080)
-                self.height = data.get("displayHeight", 2400)
                 cur_app = data.get("currentApp", "Unknown")
                 print(f"✅ Device Resolution: {self.width}x{self.height}")
                 print(f"📱 Current App: {cur_app}")
@@ -56,43 +60,37 @@ class DroidRunWirelessRecorder:
 
     def check_connection(self):
         try:
-            resp = requests.get(f"{self.base_url}/ping", headers=self.headers, timeout=2)
+            resp = self.transport.get("/ping", timeout=2)
             if resp.status_code == 200: print("✅ Connect OK!")
             else: print(f"❌ Connect Failed: {resp.status_code}")
         except: print("❌ Host Unreachable")
 
-    def get_state_json(self):
+    def get_state_json(self, fresh=False):
         try:
-            resp = requests.get(f"{self.base_url}/state_full", headers=self.headers, timeout=10)
-            if resp.status_code == 200: 
-                data = resp.json()
-                if "result" in data: return data["result"]
-                return data
+            return self.transport.get_snapshot("/state_full", fresh=fresh)
+        except: pass
+        return None
+
+    def current_tree(self):
+        # Same snapshot as the last dump/fast listing (cached until the next action)
+        try:
+            return self.transport.get_tree(self.view_endpoint)
         except: pass
         return None
 
+    def replay_view(self, tree):
+        # Replay and plans fingerprint the /a11y_tree snapshot, so "view" always comes from it
+        try:
+            if self.view_endpoint != "/a11y_tree": tree = self.transport.get_tree("/a11y_tree")
+            return screen_fingerprint(tree) if tree else None
+        except: return None
+
     def traverse_tree_list(self, nodes, result_list):
         if not nodes: return
-        if isinstance(nodes, list):
-            for node in nodes: self.traverse_tree_list(node, result_list)
-            return
-        if isinstance(nodes, dict):
-            result_list.append(nodes)
-            children = nodes.get("children") or nodes.get("subnodes")
-            if children: self.traverse_tree_list(children, result_list)
+        result_list.extend(UITree(nodes).nodes)
 
     def get_bounds(self, node):
-        b = node.get("boundsInScreen")
-        if isinstance(b, dict):
-            return [b.get("left",0), b.get("top",0), b.get("right",0), b.get("bottom",0)]
-        b_str = node.get("bounds")
-        if isinstance(b_str, str):
-            try:
-                import re
-                m = re.findall(r'\d+', b_str)
-                if len(m) >= 4: return [int(x) for x in m]
-            except: pass
-        return None
+        return parse_bounds(node)
 
     def print_list_table(self, flat_list):
         print(f"\n🔍 Found {len(flat_list)} Elements:")
@@ -110,31 +108,73 @@ class DroidRunWirelessRecorder:
             print(f"{i:<4} | {t_display:<60} | {cls:<15} | {b_str}")
         print("-" * 65)
 
+    def print_changes(self, old, new, diff):
+        print(f"\n🔄 Changes: +{len(diff['added'])} -{len(diff['removed'])} ~{len(diff['changed'])} "
+              f"(unchanged {diff['unchanged']})")
+        print("-" * 65)
+        rows = [("+", j, new) for j in diff["added"]] + [("~", j, new) for _, j in diff["changed"]]
+        rows.sort(key=lambda r: r[1])
+        rows += [("-", i, old) for i in diff["removed"]]
+        for mark, i, tree in rows:
+            node = tree.node(i)
+            cls = (node.get("className") or "N/A").split('.')[-1]
+            text = node.get("text") or node.get("contentDescription") or node.get("resourceId") or ""
+            b = tree.bounds_of(i)
+            b_str = f"[{b[0]},{b[1]}][{b[2]},{b[3]}]" if b else "Invalid"
+            # Removed rows are gone from the new list: no idx to tap
+            idx = f"{i:<4}" if mark != "-" else "    "
+            print(f"{mark} {idx} | {text:<40} | {cls:<15} | {b_str}")
+        print("-" * 65)
+
+    def expect_from_diff(self, new, diff):
+        # A node that appeared after the recorded actions is a cheap post-condition for replay
+        for j in diff["added"]:
+            node = new.node(j)
+            if node.get("text") or node.get("contentDescription"):
+                criteria = {k: node.get(k) for k in ("text", "contentDescription", "resourceId") if node.get(k)}
+                self.log_action({"action": "expect", "criteria": criteria})
+                return
+
+    def show_tree(self, tree, changes_only=False):
+        """Print the new listing (or only its changes) and remember it for the next diff."""
+        old = self.last_tree
+        diff = diff_trees(old, tree) if old is not None else None
+        if changes_only and diff is not None:
+            if diff_is_empty(diff): print("✅ No changes since the last listing")
+            else: self.print_changes(old, tree, diff)
+        else:
+            self.print_list_table(tree.nodes)
+        if diff is not None and self.actions_since_view: self.expect_from_diff(tree, diff)
+        self.last_tree = tree
+        self.actions_since_view = 0
+
     def dump_ui(self):
         print("📥 Fetching FULL UI Tree...")
-        state = self.get_state_json()
+        state = self.get_state_json(fresh=True)
         if not state: return
 
-        root_tree = state.get("a11y_tree")
-        flat_list = []
-        self.traverse_tree_list(root_tree, flat_list)
-        self.print_list_table(flat_list)
+        self.view_endpoint = "/state_full"
+        self.show_tree(self.current_tree())
+
+    def show_diff(self):
+        if self.last_tree is None: return self.dump_ui()
+        print(f"🔄 Re-fetching {self.view_endpoint} ...")
+        try:
+            tree = self.transport.get_tree(self.view_endpoint, fresh=True)
+        except Exception as e:
+            return print(f"❌ Error: {e}")
+        if tree: self.show_tree(tree, changes_only=True)
 
     def tap_index(self, index):
         idx = int(index)
-        state = self.get_state_json()
-        if not state: return
+        tree = self.current_tree()
+        if not tree: return
         
-        root_tree = state.get("a11y_tree")
-        flat_list = []
-        self.traverse_tree_list(root_tree, flat_list)
-        
-        if 0 <= idx < len(flat_list):
-            node = flat_list[idx]
-            b = self.get_bounds(node)
+        if 0 <= idx < len(tree):
+            node = tree.node(idx)
+            cx, cy = tree.center(idx)
             
-            if b:
-                cx, cy = (b[0]+b[2])//2, (b[1]+b[3])//2
+            if cx is not None:
                 
                 # --- RECORDING LOGIC ---
                 criteria = {
@@ -146,7 +186,12 @@ class DroidRunWirelessRecorder:
                 self.log_action({
                     "action": "tap",
                     "original_index": idx,
-                    "criteria": criteria
+                    "view": self.replay_view(tree), # same value = picked on the same screen
+                    "criteria": criteria,
+                    # Replay fast path: on the same view, tap "center" without searching
+                    "bounds": tree.bounds_of(idx),
+                    "center": [cx, cy],
+                    "resolution": [self.width, self.height]
                 })
                 # -----------------------
                 
@@ -173,9 +218,9 @@ class DroidRunWirelessRecorder:
 
     def _post(self, endpoint, payload):
         try:
-            url = f"{self.base_url}{endpoint}"
-            requests.post(url, json=payload, headers=self.headers, timeout=5)
-        except: pass
+            resp = self.transport.post(endpoint, payload, timeout=5)
+            if resp.status_code >= 400: print(f"❌ {endpoint} -> HTTP {resp.status_code}")
+        except Exception as e: print(f"❌ Connection Error: {e}")
 
     def sleep(self, seconds):
         try:
@@ -204,48 +249,39 @@ class DroidRunWirelessRecorder:
         print("⚡ Fetching Fast UI Tree (/a11y_tree)...")
         t1 = time.time()
         try:
-            resp = requests.get(f"{self.base_url}/a11y_tree", headers=self.headers, timeout=5)
+            resp = self.transport.get("/a11y_tree", timeout=5)
             if resp.status_code == 200:
-                data = resp.json()
-                root = data.get("result") or data # Handle wrapper if present
-                
-                # FIX: raw result is a stringified JSON
-                if isinstance(root, str):
-                    try:
-                        root = json.loads(root)
-                    except: pass
+                # One pass from the raw body (unwraps the stringified `result`)
+                root = decode_payload(resp.content)
 
                 print(f"✅ Fast Dump Done in {time.time()-t1:.3f}s")
                 
                 # Reuse dump logic if structure is same
-                flat_list = []
-                self.traverse_tree_list(root, flat_list)
-                self.print_list_table(flat_list)
+                self.transport.snapshots.put("/a11y_tree", root)
+                self.view_endpoint = "/a11y_tree"
+                self.show_tree(self.current_tree())
                     
             else: print(f"❌ Failed: {resp.status_code}")
         except Exception as e: print(f"❌ Error: {e}")
 
     def long_press_index(self, index, duration_ms=1000):
         idx = int(index)
-        state = self.get_state_json()
-        if not state: return
-        
-        root_tree = state.get("a11y_tree")
-        flat_list = []
-        self.traverse_tree_list(root_tree, flat_list)
+        tree = self.current_tree()
+        if not tree: return
         
-        if 0 <= idx < len(flat_list):
-            node = flat_list[idx]
-            b = self.get_bounds(node)
+        if 0 <= idx < len(tree):
+            cx, cy = tree.center(idx)
             
-            if b:
-                cx, cy = (b[0]+b[2])//2, (b[1]+b[3])//2
+            if cx is not None:
                 
                 # --- RECORDING LOGIC ---
                 self.log_action({
                     "action": "long_press",
                     "original_index": idx,
-                    "x": cx, "y": cy, "duration": duration_ms
+                    "x": cx, "y": cy, "duration": duration_ms,
+                    "view": self.replay_view(tree),
+                    "bounds": tree.bounds_of(idx),
+                    "resolution": [self.width, self.height]
                 })
                 # -----------------------
                 
@@ -262,7 +298,8 @@ class DroidRunWirelessRecorder:
             "action": "swipe",
             "startX": int(sx), "startY": int(sy),
             "endX": int(ex), "endY": int(ey),
-            "duration": duration
+            "duration": duration,
+            "resolution": [self.width, self.height]
         }
         if direction:
             log_data["direction"] = direction
@@ -281,7 +318,7 @@ def main():
     
     while True:
         print("\n[idx <N>] [long <N>] [swipe <sx sy ex ey>] [txt <MSG>] [clear] [key <N|Name>]")
-        print("[dump/fast] [sleep <N>] [home] [back] [exit] -> (Type 'help' for details)")
+        print("[dump/fast/diff] [sleep <N>] [home] [back] [exit] -> (Type 'help' for details)")
         print("Shortcuts: enter, backspace, tab, up, down, left, right")
         cmd = input("REC > ").strip().lower()
         
@@ -292,6 +329,7 @@ def main():
             print("\n📖 --- คู่มือการใช้งาน (Commands) ---")
             print("  dump       : ดึงโครงสร้างหน้าจอ (UI Tree) แบบละเอียด")
             print("  fast       : ดึงโครงสร้างหน้าจอแบบเร็ว (แนะนำ)")
+            print("  diff       : ดึงหน้าจอใหม่ แสดงเฉพาะส่วนที่เปลี่ยนจากครั้งก่อน (+ เพิ่ม, - หาย, ~ ย้าย/เปลี่ยนสถานะ)")
             print("  idx <N>    : จิ้ม (Tap) ที่ Index นั้น เช่น 'idx 5'")
             print("  long <N>   : กดค้างที่ Index นั้น (ค่าเดิม 1วิ) เช่น 'long 5 2000'")
             print("  swipe      : ปัดหน้าจอพิกัด (sx, sy) ไป (ex, ey) เช่น 'swipe 500 1500 500 500 500'")
@@ -308,6 +346,7 @@ def main():
 
         elif cmd == 'dump': recorder.dump_ui()
         elif cmd == 'fast': recorder.dump_fast()
+        elif cmd == 'diff': recorder.show_diff()
         elif cmd == 'clear': recorder.clear_text()
         elif cmd.startswith('key'): 
             arg = cmd.split()[1] if len(cmd.split())>1 else "0"
@@ -336,14 +375,7 @@ def main():
             if len(p) >= 2 and p[1] in ["left", "right", "up", "down"]:
                 dir_cmd = p[1]
                 dur = int(p[2]) if len(p) > 2 else 500
-                cx, cy = recorder.width // 2, recorder.height // 2
-                dx, dy = recorder.width // 3, recorder.height // 3
-                
-                if dir_cmd == "left": sx, sy, ex, ey = cx + dx, cy, cx - dx, cy
-                elif dir_cmd == "right": sx, sy, ex, ey = cx - dx, cy, cx + dx, cy
-                elif dir_cmd == "up": sx, sy, ex, ey = cx, cy + dy, cx, cy - dy
-                elif dir_cmd == "down": sx, sy, ex, ey = cx, cy - dy, cx, cy + dy
-                
+                sx, sy, ex, ey = swipe_points(dir_cmd, (recorder.width, recorder.height))
                 recorder.swipe(sx, sy, ex, ey, dur, direction=dir_cmd)
             elif len(p) >= 5:
                 dur = int(p[5]) if len(p) > 5 else 500
@@ -0,0 +1,80 @@
+import argparse
+import json
+import sys
+import time
+
+from droidrun_transport import get_transport
+from wifi_plan import PlanRunner, step_from_action
+
+# --- REPLAY ---
+# Runs action_wifi_log.txt directly: each line is parsed and executed as it is
+# read (no generated .py, no import), through the same PlanRunner as plans.
+
+def iter_log_steps(f, errors):
+    """Plan steps from log lines, read lazily; bad lines go to `errors` as (line_no, message)."""
+    for line_no, line in enumerate(f, 1):
+        line = line.strip()
+        if not line: continue
+        try:
+            step = step_from_action(json.loads(line))
+            step["line"] = line_no
+            yield step
+        except Exception as e:
+            errors.append((line_no, str(e)))
+            print(f"⚠️ Error parsing line {line_no}: {e}")
+
+def replay_log(path, transport, waits=False, speed=1.0, verbose=True):
+    """Replay a recording; returns (step results, parse errors)."""
+    runner = PlanRunner(transport, waits=waits, verbose=verbose, speed=speed)
+    errors = []
+    with open(path, "r", encoding="utf-8") as f:
+        results = runner.run_steps(iter_log_steps(f, errors))
+    return results, errors
+
+
+class ReplayBot:
+    """DroidRunBot-compatible wrapper (ip, port, api_key) -> .run() for a raw log."""
+
+    def __init__(self, path, ip=None, port=None, api_key=None, waits=False, speed=1.0):
+        self.path = path
+        self.transport = get_transport(ip, port, api_key)
+        self.waits = waits
+        self.speed = speed
+
+    def run(self):
+        return replay_log(self.path, self.transport, self.waits, self.speed)
+
+def print_timing(results):
+    print("\n⏱ --- Step Timing ---")
+    print(f"{'STEP':>4} | {'OP':<10} | {'TIME':>8} | ERROR")
+    print("-" * 50)
+    for r in results:
+        print(f"{r['step']:>4} | {r['op']:<10} | {r['elapsed']:>7.3f}s | {r.get('error', '')}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded action log without compiling it")
+    parser.add_argument("log", nargs="?", default="action_wifi_log.txt")
+    parser.add_argument("--speed", type=float, default=1.0, help="divide fixed sleeps by this (0 = skip them)")
+    parser.add_argument("--wait", action="store_true", help="condition-based waits instead of fixed settles")
+    parser.add_argument("--timing", action="store_true", help="print per-step timing")
+    parser.add_argument("--json", dest="json_out", help="write per-step results to this file")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        results, errors = replay_log(args.log, get_transport(), waits=args.wait, speed=args.speed)
+    except FileNotFoundError:
+        print(f"❌ ไม่พบไฟล์ Log: '{args.log}'")
+        sys.exit(1)
+    wall = time.perf_counter() - t0
+
+    if args.timing: print_timing(results)
+    failed = [r for r in results if not r["ok"]]
+    print(f"⏱ {wall:.2f}s, {len(results)} steps, {len(failed)} failed, {len(errors)} bad lines")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"wall_time": round(wall, 3), "steps": results, "errors": errors}, f, indent=2, ensure_ascii=False)
+    sys.exit(1 if failed or errors else 0)
+
+if __name__ == "__main__":
+    main()
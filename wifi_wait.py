@@ -0,0 +1,107 @@
+import hashlib
+import time
+from ui_tree import UITree, decode_payload, diff_is_empty, diff_trees
+
+# --- POLLING ---
+# Start fast, back off geometrically so long waits don't hammer the phone
+MIN_INTERVAL = 0.1
+MAX_INTERVAL = 1.0
+BACKOFF = 1.5
+
+def find_node(root, criteria):
+    """Same scoring as DroidRunBot.find_node (exact text/desc/id, text substring)."""
+    return UITree(root).find_node(criteria)
+
+
+class WaitEngine:
+    """Condition-based waits that poll the Portal instead of sleeping blindly.
+
+    Every wait returns as soon as its condition holds and gives up after
+    `timeout` seconds (returning None/False), so scripts run as fast as the
+    device allows and fail fast when something never shows up.
+    """
+
+    def __init__(self, transport, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        self.transport = transport
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+    def _poll(self, check, timeout):
+        deadline = time.monotonic() + timeout
+        interval = self.min_interval
+        while True:
+            result = check()
+            if result: return result
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: return result
+            time.sleep(min(interval, remaining))
+            interval = min(interval * BACKOFF, self.max_interval)
+
+    def _get_json(self, endpoint):
+        try:
+            resp = self.transport.get(endpoint)
+            if resp.status_code != 200: return None, None
+            root = decode_payload(resp.content)
+            # Latest poll doubles as the cached snapshot for the next find_node
+            if endpoint == "/a11y_tree" and root is not None: self.transport.snapshots.put(endpoint, root)
+            return root, resp.content
+        except: return None, None
+
+    def get_tree(self):
+        return self._get_json("/a11y_tree")[0]
+
+    def get_phone_state(self):
+        state = self._get_json("/phone_state")[0]
+        return state if isinstance(state, dict) else {}
+
+    # --- WAITS ---
+    def wait_for_node(self, criteria, timeout=10.0, matcher=None):
+        """Poll /a11y_tree until `criteria` matches a node; returns the node or None.
+
+        Without a custom matcher each poll stops decoding at the first exact match.
+        """
+        def check():
+            if matcher is None:
+                try: return self.transport.find_node(criteria, fresh=True)
+                except: return None
+            root = self.get_tree()
+            return matcher(root, criteria) if root else None
+        return self._poll(check, timeout)
+
+    def wait_for_idle(self, timeout=2.0, stable=2):
+        """Wait until /a11y_tree stops changing for `stable` consecutive polls."""
+        last = [None, 0]
+        def check():
+            raw = self._get_json("/a11y_tree")[1]
+            if raw is None: return False
+            digest = hashlib.md5(raw).digest()
+            if digest == last[0]: last[1] += 1
+            else: last[0], last[1] = digest, 1
+            return last[1] >= stable
+        return bool(self._poll(check, timeout))
+
+    def wait_for_change(self, timeout=5.0, baseline=None):
+        """Wait until the screen differs from `baseline` (a UITree; default: the screen now).
+
+        Returns the diff_trees() result, or None if nothing changed in time.
+        """
+        if baseline is None:
+            root = self.get_tree()
+            if root is None: return None
+            baseline = UITree(root)
+        last_raw = [None]
+        def check():
+            root, raw = self._get_json("/a11y_tree")
+            # Byte-identical poll: nothing to diff
+            if root is None or raw == last_raw[0]: return None
+            last_raw[0] = raw
+            diff = diff_trees(baseline, UITree(root))
+            return None if diff_is_empty(diff) else diff
+        return self._poll(check, timeout)
+
+    def wait_for_app(self, package, timeout=10.0):
+        """Wait until `package` (package name or app label) is in the foreground."""
+        def check():
+            state = self.get_phone_state()
+            return package in (state.get("packageName"), state.get("currentApp"))
+        return bool(self._poll(check, timeout))